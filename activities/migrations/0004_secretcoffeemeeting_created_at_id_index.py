@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-16 20:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0003_secretcoffeemeeting_average_rating_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='secretcoffeemeeting',
+            index=models.Index(fields=['created_at', 'id'], name='secret_coff_created_1212d0_idx'),
+        ),
+    ]
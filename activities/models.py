@@ -122,6 +122,7 @@ class SecretCoffeeMeeting(models.Model):
             models.Index(fields=['meeting_id']),
             models.Index(fields=['status']),
             models.Index(fields=['meeting_date']),
+            models.Index(fields=['created_at', 'id']),  # keyset-пагинация истории в Data API
         ]
 
     @sync_to_async
@@ -78,12 +78,73 @@ class AnonymousCoffeeService:
             logger.error(f"Ошибка в анонимном matching: {e}")
             return False
     
-    async def _get_participants_with_preferences(self, session):
-        """Получить участников с их предпочтениями"""
+    async def run_incremental_matching(self):
+        """
+        Подбор пар для подписавшихся после еженедельного matching.
+
+        Существующие встречи недели не меняются: подбираются только участники
+        сессии без встречи (тем же matching и с теми же исключениями, что и
+        еженедельный подбор). Работа пропорциональна числу таких участников,
+        а не размеру всей сессии.
+        """
+        try:
+            today = timezone.now().date()
+            week_start = today - timedelta(days=today.weekday())
+
+            session = await ActivitySession.objects.aget(
+                activity_type='secret_coffee',
+                week_start=week_start
+            )
+            if session.status != 'active':
+                # еженедельный matching ещё не прошёл — он подберёт всех сразу
+                logger.info("Инкрементальный matching пропущен: еженедельный подбор ещё не выполнен")
+                return False
+
+            participants = await self._get_participants_with_preferences(session, unpaired_only=True)
+            if len(participants) < 2:
+                logger.info(f"Инкрементальный matching: без пары {len(participants)} участник(ов), подбор не нужен")
+                return False
+
+            employee_list = [p['employee'] for p in participants]
+            pairs = await java_matching_service.match_coffee_pairs(employee_list)
+
+            participant_dict = {p['employee'].id: p for p in participants}
+            pairs = [(participant_dict[emp1.id], participant_dict[emp2.id]) for emp1, emp2 in pairs]
+            if not pairs:
+                logger.warning(f"Инкрементальный matching: не удалось подобрать пары для {len(participants)} участников")
+                return False
+
+            created_meetings = await self._create_anonymous_meetings(session, pairs)
+            await self._send_initial_notifications(created_meetings)
+
+            logger.info(f"Инкрементальный matching: создано {len(created_meetings)} встреч "
+                        f"для {len(participants)} участников без пары")
+            return True
+
+        except ActivitySession.DoesNotExist:
+            logger.info("Инкрементальный matching пропущен: нет сессии Тайного кофе на эту неделю")
+            return False
+        except Exception as e:
+            logger.error(f"Ошибка в инкрементальном matching: {e}")
+            return False
+
+    async def _get_participants_with_preferences(self, session, unpaired_only=False):
+        """
+        Получить участников с их предпочтениями.
+
+        unpaired_only — только участники, у которых ещё нет встречи в этой сессии.
+        """
         participants_qs = ActivityParticipant.objects.filter(
             activity_session=session,
             subscription_status=True
         ).select_related('employee')
+        if unpaired_only:
+            meetings = SecretCoffeeMeeting.objects.filter(activity_session=session)
+            participants_qs = participants_qs.exclude(
+                employee_id__in=meetings.values('employee1_id')
+            ).exclude(
+                employee_id__in=meetings.values('employee2_id')
+            )
         
         participants = []
         async for participant in participants_qs:
@@ -288,7 +349,7 @@ class AnonymousCoffeeService:
         try:
             meeting.emergency_stopped = True
             meeting.status = 'cancelled'
-            await meeting.asave()
+            await meeting.asave(update_fields=['emergency_stopped', 'status', 'updated_at'])
             
             # Уведомляем модератора
             await self._notify_moderator(meeting, employee)
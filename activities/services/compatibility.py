@@ -0,0 +1,297 @@
+"""
+Оценка совместимости сотрудников для подбора пар.
+
+Сотрудник кодируется признаками (Participant): битовая маска интересов, отдел,
+бизнес-центр, уровень должности (position_level из MatchingServiceClient),
+новичок / готовность встречаться с новичками.
+
+Одна и та же формула считается двумя способами:
+  - pair_score(a, b) — для одной пары (чистый Python);
+  - score_blocks() / top_candidates() — попарная матрица оценок блоками
+    block_size x block_size векторными операциями NumPy: память ограничена
+    размером блока, а не квадратом числа участников;
+  - pair_scores() — оценки готовых пар подбора теми же блоками.
+
+NumPy необязателен: без него доступны только скалярные функции
+(HAS_NUMPY = False), а движок подбора выбирает кандидатов случайно.
+"""
+from collections import namedtuple
+from datetime import timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except Exception:
+    np = None
+    HAS_NUMPY = False
+
+Participant = namedtuple(
+    'Participant',
+    ['id', 'department_id', 'business_center_id', 'is_newcomer', 'with_newcomers', 'interests', 'seniority'],
+    defaults=(0, -1),
+)
+
+# Уровни должности (position_level) -> код; -1 — неизвестен
+SENIORITY_CODES = {'JUNIOR': 0, 'MID': 1, 'SENIOR': 2}
+
+# Веса совместимости
+INTEREST_WEIGHT = 0.5              # за каждый общий интерес...
+INTEREST_CAP = 3                   # ...но не больше чем за столько
+CROSS_DEPARTMENT_WEIGHT = 2.0      # знакомство с коллегой из другого отдела
+SAME_BUSINESS_CENTER_WEIGHT = 1.0  # проще встретиться офлайн
+NEWCOMER_WEIGHT = 1.5              # новичок и тот, кто хочет встречаться с новичками
+SENIORITY_MIX_WEIGHT = 0.5         # разный уровень: обмен опытом
+MAX_SCORE = (INTEREST_WEIGHT * INTEREST_CAP + CROSS_DEPARTMENT_WEIGHT + SAME_BUSINESS_CENTER_WEIGHT
+             + NEWCOMER_WEIGHT + SENIORITY_MIX_WEIGHT)
+
+# Строк/столбцов в блоке матрицы: блок float32 1024 x 1024 — 4 МБ
+BLOCK_SIZE = 1024
+
+
+def pair_score(a: Participant, b: Participant) -> float:
+    """Оценка пары: чем больше, тем полезнее встреча (от 0 до MAX_SCORE)."""
+    score = INTEREST_WEIGHT * min((a.interests & b.interests).bit_count(), INTEREST_CAP)
+    if a.department_id is None or a.department_id != b.department_id:
+        score += CROSS_DEPARTMENT_WEIGHT
+    if a.business_center_id is not None and a.business_center_id == b.business_center_id:
+        score += SAME_BUSINESS_CENTER_WEIGHT
+    if (a.is_newcomer and b.with_newcomers) or (b.is_newcomer and a.with_newcomers):
+        score += NEWCOMER_WEIGHT
+    if a.seniority >= 0 and b.seniority >= 0 and a.seniority != b.seniority:
+        score += SENIORITY_MIX_WEIGHT
+    return score
+
+
+def normalize(score: float) -> float:
+    """Оценка в шкале CoffeePair.match_score: [0, 1]."""
+    return round(score / MAX_SCORE, 3)
+
+
+def explain(a: Participant, b: Participant) -> Tuple[float, List[str]]:
+    """
+    Оценка пары, нормированная в [0, 1] (как CoffeePair.match_score),
+    и причины, из которых она сложилась.
+    """
+    return normalize(pair_score(a, b)), reasons(a, b)
+
+
+def reasons(a: Participant, b: Participant) -> List[str]:
+    """Причины, из которых сложилась оценка пары (без подсчёта самой оценки)."""
+    found = []
+    shared = (a.interests & b.interests).bit_count()
+    if shared:
+        found.append(f"общие интересы: {shared}")
+    if a.department_id is None or a.department_id != b.department_id:
+        found.append("разные отделы")
+    if a.business_center_id is not None and a.business_center_id == b.business_center_id:
+        found.append("один бизнес-центр")
+    if (a.is_newcomer and b.with_newcomers) or (b.is_newcomer and a.with_newcomers):
+        found.append("встреча с новичком")
+    if a.seniority >= 0 and b.seniority >= 0 and a.seniority != b.seniority:
+        found.append("разный уровень должности")
+    return found
+
+
+def participants_from_employees(employees) -> List[Participant]:
+    """
+    Признаки для списка Employee. Активные интересы всех сотрудников читаются
+    одним запросом; остальное берётся из уже загруженных полей.
+    """
+    from django.conf import settings
+    from django.utils import timezone
+    from employees.models import EmployeeInterest
+    from bots.services.matching_service_client import position_level
+
+    employees = list(employees)
+    interest_ids: Dict[int, List[int]] = {}
+    rows = EmployeeInterest.objects.filter(
+        employee_id__in=[emp.id for emp in employees], is_active=True,
+    ).values_list('employee_id', 'interest_id')
+    for emp_id, interest_id in rows.iterator():
+        interest_ids.setdefault(emp_id, []).append(interest_id)
+    # плотная нумерация интересов: биты маски идут подряд
+    catalog = sorted({interest_id for ids in interest_ids.values() for interest_id in ids})
+    bit_of = {interest_id: bit for bit, interest_id in enumerate(catalog)}
+
+    newcomer_since = timezone.now().date() - timedelta(days=getattr(settings, 'MATCHING_NEWCOMER_DAYS', 90))
+    participants = []
+    for emp in employees:
+        mask = 0
+        for interest_id in interest_ids.get(emp.id, ()):
+            mask |= 1 << bit_of[interest_id]
+        hire_date = getattr(emp, 'hire_date', None)
+        profile = getattr(emp, 'profile', None)
+        participants.append(Participant(
+            id=int(emp.id),
+            department_id=getattr(emp, 'department_id', None),
+            business_center_id=getattr(emp, 'business_center_id', None),
+            is_newcomer=bool(hire_date and hire_date >= newcomer_since),
+            with_newcomers=bool(getattr(profile, 'with_newcomers', False)),
+            interests=mask,
+            seniority=SENIORITY_CODES.get(position_level(getattr(emp, 'position', None)), -1),
+        ))
+    return participants
+
+
+def describe_pairs(employee_pairs) -> List[Tuple[float, str]]:
+    """
+    match_score и match_reason для пар сотрудников одного подбора (CoffeePair):
+    признаки читаются одним запросом, оценки — одним проходом pair_scores().
+    """
+    employee_pairs = list(employee_pairs)
+    features = participants_from_employees([emp for pair in employee_pairs for emp in pair])
+    left, right = features[0::2], features[1::2]
+    return [(normalize(score), '; '.join(reasons(a, b)))
+            for a, b, score in zip(left, right, pair_scores(left, right))]
+
+
+# --- Векторная блочная матрица (NumPy) ---
+
+if HAS_NUMPY:
+    if hasattr(np, 'bitwise_count'):
+        _popcount = np.bitwise_count
+    else:
+        _POPCOUNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+        def _popcount(words):
+            words = np.ascontiguousarray(words)
+            return _POPCOUNT8[words.view(np.uint8)].reshape(words.shape + (8,)).sum(axis=-1)
+
+
+def _encode(participants: List[Participant]) -> Dict[str, 'np.ndarray']:
+    n = len(participants)
+    words = max(1, (max((p.interests.bit_length() for p in participants), default=0) + 63) // 64)
+    interests = np.zeros((n, words), dtype=np.uint64)
+    for i, p in enumerate(participants):
+        bits = p.interests
+        for w in range(words):
+            interests[i, w] = (bits >> (64 * w)) & 0xFFFFFFFFFFFFFFFF
+    return {
+        'interests': interests,
+        'department': np.array([-1 if p.department_id is None else p.department_id for p in participants], dtype=np.int64),
+        'business_center': np.array([-1 if p.business_center_id is None else p.business_center_id
+                                     for p in participants], dtype=np.int64),
+        'newcomer': np.array([bool(p.is_newcomer) for p in participants], dtype=bool),
+        'with_newcomers': np.array([bool(p.with_newcomers) for p in participants], dtype=bool),
+        'seniority': np.array([p.seniority for p in participants], dtype=np.int8),
+    }
+
+
+def _score_tile(enc, rows: slice, cols: slice) -> 'np.ndarray':
+    """Оценки строк rows против столбцов cols — та же формула, что pair_score (float32)."""
+    interests_r, interests_c = enc['interests'][rows], enc['interests'][cols]
+    shared = _popcount(interests_r[:, 0][:, None] & interests_c[:, 0][None, :])
+    for w in range(1, interests_r.shape[1]):
+        # ограничиваем на каждом шаге: сумма не переполнит узкий целый тип
+        shared = np.minimum(shared, INTEREST_CAP) + _popcount(interests_r[:, w][:, None] & interests_c[:, w][None, :])
+    score = np.minimum(shared, INTEREST_CAP).astype(np.float32)
+    score *= np.float32(INTEREST_WEIGHT)
+
+    dept_r, dept_c = enc['department'][rows][:, None], enc['department'][cols][None, :]
+    score += np.float32(CROSS_DEPARTMENT_WEIGHT) * ((dept_r < 0) | (dept_r != dept_c))
+    bc_r, bc_c = enc['business_center'][rows][:, None], enc['business_center'][cols][None, :]
+    score += np.float32(SAME_BUSINESS_CENTER_WEIGHT) * ((bc_r >= 0) & (bc_r == bc_c))
+    new_r, new_c = enc['newcomer'][rows][:, None], enc['newcomer'][cols][None, :]
+    with_r, with_c = enc['with_newcomers'][rows][:, None], enc['with_newcomers'][cols][None, :]
+    score += np.float32(NEWCOMER_WEIGHT) * ((new_r & with_c) | (new_c & with_r))
+    sen_r, sen_c = enc['seniority'][rows][:, None], enc['seniority'][cols][None, :]
+    score += np.float32(SENIORITY_MIX_WEIGHT) * ((sen_r >= 0) & (sen_c >= 0) & (sen_r != sen_c))
+    return score
+
+
+def score_blocks(participants: Iterable[Participant],
+                 block_size: int = BLOCK_SIZE) -> Iterator[Tuple[int, int, 'np.ndarray']]:
+    """
+    Попарная матрица оценок по блокам: (первая строка, первый столбец, блок).
+    Диагональ (пара с самим собой) равна -inf.
+    """
+    if not HAS_NUMPY:
+        raise RuntimeError("score_blocks требует numpy")
+    participants = list(participants)
+    enc = _encode(participants)
+    n = len(participants)
+    for r0 in range(0, n, block_size):
+        for c0 in range(0, n, block_size):
+            tile = _score_tile(enc, slice(r0, min(n, r0 + block_size)), slice(c0, min(n, c0 + block_size)))
+            if r0 == c0:
+                np.fill_diagonal(tile, -np.inf)
+            yield r0, c0, tile
+
+
+def pair_scores(left: List[Participant], right: List[Participant], block_size: int = BLOCK_SIZE) -> List[float]:
+    """
+    Оценки пар (left[i], right[i]). С NumPy — диагонали блоков block_size x block_size
+    той же матрицы, что в score_blocks(); без него — pair_score() по парам.
+    """
+    left, right = list(left), list(right)
+    if not HAS_NUMPY:
+        return [pair_score(a, b) for a, b in zip(left, right)]
+    m = len(left)
+    enc = _encode(left + right)
+    scores: List[float] = []
+    for i0 in range(0, m, block_size):
+        i1 = min(m, i0 + block_size)
+        scores.extend(np.diagonal(_score_tile(enc, slice(i0, i1), slice(m + i0, m + i1))).tolist())
+    return scores
+
+
+def top_candidates(participants: Iterable[Participant], k: int,
+                   exclusions: Optional[Dict[int, Set[int]]] = None,
+                   block_size: int = BLOCK_SIZE) -> List[List[Tuple[int, float]]]:
+    """
+    Для каждого участника — до k лучших по оценке партнёров [(индекс, оценка), ...]
+    без исключённых пар. Индексы — позиции в participants.
+
+    Матрица не хранится целиком: по каждому блоку строк держится только
+    текущий top-k, память O(block_size^2 + n * k).
+    """
+    if not HAS_NUMPY:
+        raise RuntimeError("top_candidates требует numpy")
+    participants = list(participants)
+    n = len(participants)
+    k = min(k, n - 1)
+    if k <= 0:
+        return [[] for _ in range(n)]
+
+    index = {p.id: i for i, p in enumerate(participants)}
+    excluded_rows, excluded_cols = [], []
+    for emp_id, others in (exclusions or {}).items():
+        i = index.get(emp_id)
+        if i is None:
+            continue
+        for other_id in others:
+            j = index.get(other_id)
+            if j is not None:
+                excluded_rows += (i, j)
+                excluded_cols += (j, i)
+    excluded_rows = np.array(excluded_rows, dtype=np.int64)
+    excluded_cols = np.array(excluded_cols, dtype=np.int64)
+
+    enc = _encode(participants)
+    result: List[List[Tuple[int, float]]] = []
+    for r0 in range(0, n, block_size):
+        r1 = min(n, r0 + block_size)
+        in_block = (excluded_rows >= r0) & (excluded_rows < r1)
+        block_rows, block_cols = excluded_rows[in_block], excluded_cols[in_block]
+        best_score = np.empty((r1 - r0, 0), dtype=np.float32)
+        best_index = np.empty((r1 - r0, 0), dtype=np.int64)
+        for c0 in range(0, n, block_size):
+            c1 = min(n, c0 + block_size)
+            tile = _score_tile(enc, slice(r0, r1), slice(c0, c1))
+            if r0 == c0:
+                np.fill_diagonal(tile, -np.inf)
+            in_tile = (block_cols >= c0) & (block_cols < c1)
+            tile[block_rows[in_tile] - r0, block_cols[in_tile] - c0] = -np.inf
+
+            scores = np.concatenate([best_score, tile], axis=1)
+            indices = np.concatenate([best_index, np.broadcast_to(np.arange(c0, c1), tile.shape)], axis=1)
+            if scores.shape[1] > k:
+                keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, keep, axis=1)
+                indices = np.take_along_axis(indices, keep, axis=1)
+            best_score, best_index = scores, indices
+
+        for row_index, row_score in zip(best_index, best_score):
+            result.append([(int(j), float(s)) for j, s in zip(row_index.tolist(), row_score.tolist()) if s != -np.inf])
+    return result
@@ -1,33 +1,51 @@
 import logging
-import asyncio
 import json
-import aiohttp
-from datetime import datetime
-from config.settings import MATCHING_SERVICE_URL
+import random
+import hashlib
+from datetime import datetime, timedelta
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.utils import timezone
+from config.settings import MATCHING_SERVICE_URL, MATCHING_SHARD_BY, CACHE_TTL, MATCHING_ENGINE_WORKERS
+from activities.models import SecretCoffeeMeeting
+from employees.models import CoffeePair
+from activities.services import compatibility, matching_engine
 from activities.services.redis_service import activity_redis_service
 from bots.services.matching_service_client import MatchingServiceClient
+from python_app.services import cache_utils
+from bots.services.async_matching_client import get_default_async_client
 
 logger = logging.getLogger(__name__)
 
 
 class JavaMatchingService:
     """Сервис-адаптер для взаимодействия с внешним Java matching-сервисом.
-    Использует синхронный `MatchingServiceClient` через `asyncio.to_thread`, чтобы
-    не блокировать event loop.
+    Все вызовы идут через общий `AsyncMatchingServiceClient`: одна долгоживущая
+    aiohttp-сессия, асинхронный retry и те же метрики и circuit breaker, что у
+    синхронного клиента. Потоки исполнителя на время запросов не занимаются.
     """
 
     def __init__(self):
         # MATCHING_SERVICE_URL берется из настроек; тут поле оставлено для совместимости
         self.base_url = MATCHING_SERVICE_URL
-        # Таймаут для aiohttp-вызовов в методах, использующих HTTP
-        self.timeout = aiohttp.ClientTimeout(total=30)
+        self._client = None
 
-    async def match_coffee_pairs(self, participants):
+    @property
+    def client(self):
+        # создаётся лениво: настройки Django должны быть загружены
+        if self._client is None:
+            self._client = get_default_async_client()
+        return self._client
+
+    async def match_coffee_pairs(self, participants, shard_by=None, seed=None):
         """
         Формирование пар для Тайного кофе через внешний Java-сервис.
 
         Args:
             participants: список объектов Employee
+            shard_by: 'business_center' или 'department' — подбор по шардам с
+                параллельными запросами; по умолчанию MATCHING_SHARD_BY
+            seed: seed локального движка на случай fallback (для воспроизводимости)
 
         Returns:
             список пар [(employee1, employee2), ...]
@@ -37,23 +55,29 @@ class JavaMatchingService:
                 return []
 
             # Кэширование: формируем ключ по id участников
-            participant_ids = sorted([int(p.id) for p in participants])
-            cache_key = f"matching_coffee_{'_'.join(map(str, participant_ids))}"
-            cached_result = await activity_redis_service.get_cached_activity_data(cache_key)
+            if shard_by is None:
+                shard_by = MATCHING_SHARD_BY
+            today = timezone.localdate()
+            week_start = today - timedelta(days=today.weekday())
+            cache_key = await self._matching_cache_key(participants, shard_by, week_start)
+            cached_result = await activity_redis_service.get_cached_activity_data(cache_key) if cache_key else None
             if cached_result:
                 logger.info("✅ Использованы кэшированные результаты matching")
                 return self._parse_matching_result(cached_result, participants)
 
-            # Вызываем синхронный клиент в пуле потоков
-            client = MatchingServiceClient()
-            pairs_data = await asyncio.to_thread(client.run_secret_coffee_matching, participants)
+            if shard_by:
+                pairs_data = await self.client.run_sharded_matching(participants, shard_by)
+            else:
+                pairs_data = await self.client.run_secret_coffee_matching(participants)
 
             if not pairs_data:
                 logger.warning("Java-сервис вернул пустой ответ или был недоступен — используем fallback")
-                return self._fallback_matching(participants)
+                return await self._fallback_matching(participants, seed)
 
-            # Кэшируем результат
-            await activity_redis_service.cache_activity_data(cache_key, {"pairs": pairs_data}, timeout=3600)
+            # Кэшируем результат до конца недели или до изменения истории пар
+            if cache_key:
+                await activity_redis_service.cache_activity_data(
+                    cache_key, {"pairs": pairs_data}, timeout=self._matching_cache_ttl(week_start))
 
             # Сопоставляем id -> объекты Employee
             participant_dict = {int(emp.id): emp for emp in participants}
@@ -71,8 +95,32 @@ class JavaMatchingService:
 
         except Exception as e:
             logger.error(f"❌ Ошибка в адаптере JavaMatchingService.match_coffee_pairs: {e}")
-            return self._fallback_matching(participants)
+            return await self._fallback_matching(participants, seed)
     
+    async def _matching_cache_key(self, participants, shard_by, week_start):
+        """
+        Ключ кэша результата подбора фиксированной длины: неделя подбора, режим
+        шардирования, поколение истории пар (CoffeePair) и sha256 отсортированных
+        id участников. Новая пара в истории или новая неделя переводят подбор на
+        новый ключ. Встречи Тайного кофе (previous_matches) в ключ не входят: они
+        создаются сразу после подбора и меняются статусами в течение недели.
+        None — поколение недоступно, кэш не используется.
+        """
+        versions = await cache_utils.aget_data_api_versions([cache_utils.MATCHING_HISTORY_DOMAIN])
+        if versions is None:
+            return None
+        participant_ids = sorted(int(p.id) for p in participants)
+        digest = hashlib.sha256(','.join(map(str, participant_ids)).encode()).hexdigest()
+        generation = versions[cache_utils.MATCHING_HISTORY_DOMAIN]
+        return f"matching_coffee:{week_start.isoformat()}:{shard_by or 'all'}:g{generation}:{digest}"
+
+    @staticmethod
+    def _matching_cache_ttl(week_start):
+        """TTL записи: до начала следующей недели, но не больше CACHE_TTL['matching_result']."""
+        next_week = timezone.make_aware(datetime.combine(week_start + timedelta(days=7), datetime.min.time()))
+        remaining = int((next_week - timezone.now()).total_seconds())
+        return max(60, min(CACHE_TTL['matching_result'], remaining))
+
     async def match_tournament_bracket(self, participants, game_type="chess", format="swiss"):
         """
         Формирование турнирной сетки
@@ -100,18 +148,13 @@ class JavaMatchingService:
                 'rounds': 3 if len(participants) <= 8 else 5
             }
             
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                url = f"{self.base_url}/api/matching/tournament/bracket"
-                
-                async with session.post(url, json=request_data) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        logger.info(f"✅ Турнирная сетка создана: {len(result.get('matches', []))} матчей")
-                        return result
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"❌ Ошибка создания турнирной сетки: {error_text}")
-                        return self._fallback_tournament(participants, game_type)
+            response = await self.client.request_json('post', '/api/matching/tournament/bracket', request_data)
+            if response is not None and response[0] == 200 and isinstance(response[1], dict):
+                result = response[1]
+                logger.info(f"✅ Турнирная сетка создана: {len(result.get('matches', []))} матчей")
+                return result
+            logger.error(f"❌ Ошибка создания турнирной сетки: {response[1] if response else 'нет ответа'}")
+            return self._fallback_tournament(participants, game_type)
                         
         except Exception as e:
             logger.error(f"❌ Ошибка создания турнира: {e}")
@@ -148,18 +191,13 @@ class JavaMatchingService:
                 'max_teams': len(participants) // team_size
             }
             
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                url = f"{self.base_url}/api/matching/teams/generate"
-                
-                async with session.post(url, json=request_data) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        logger.info(f"✅ Сгенерировано {len(result.get('teams', []))} команд")
-                        return result
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"❌ Ошибка генерации команд: {error_text}")
-                        return self._fallback_teams(participants, team_size)
+            response = await self.client.request_json('post', '/api/matching/teams/generate', request_data)
+            if response is not None and response[0] == 200 and isinstance(response[1], dict):
+                result = response[1]
+                logger.info(f"✅ Сгенерировано {len(result.get('teams', []))} команд")
+                return result
+            logger.error(f"❌ Ошибка генерации команд: {response[1] if response else 'нет ответа'}")
+            return self._fallback_teams(participants, team_size)
                         
         except Exception as e:
             logger.error(f"❌ Ошибка генерации команд: {e}")
@@ -168,11 +206,11 @@ class JavaMatchingService:
     def _parse_matching_result(self, result, participants):
         """Парсинг результата от Java микросервиса"""
         pairs = []
-        participant_dict = {emp.id: emp for emp in participants}
+        participant_dict = {int(emp.id): emp for emp in participants}
         
         for pair_data in result.get('pairs', []):
-            emp1_id = pair_data.get('employee1_id')
-            emp2_id = pair_data.get('employee2_id')
+            emp1_id = int(pair_data.get('employee1_id'))
+            emp2_id = int(pair_data.get('employee2_id'))
             
             if emp1_id in participant_dict and emp2_id in participant_dict:
                 pairs.append((
@@ -182,42 +220,55 @@ class JavaMatchingService:
         
         return pairs
     
-    def _fallback_matching(self, participants):
-        """Fallback алгоритм matching при недоступности Java сервиса"""
-        logger.warning("🔄 Используется fallback matching алгоритм")
-        
-        # Простой алгоритм - чередование отделов
-        departments = {}
-        for emp in participants:
-            if emp.department not in departments:
-                departments[emp.department] = []
-            departments[emp.department].append(emp)
-        
-        pairs = []
-        remaining = participants.copy()
-        
-        while len(remaining) >= 2:
-            emp1 = remaining[0]
-            
-            # Ищем сотрудника из другого отдела
-            emp2 = None
-            for emp in remaining[1:]:
-                if emp.department != emp1.department:
-                    emp2 = emp
-                    break
-            
-            # Если не нашли из другого отдела, берем любого
-            if not emp2 and len(remaining) >= 2:
-                emp2 = remaining[1]
-            
-            if emp2:
-                pairs.append((emp1, emp2))
-                remaining.remove(emp1)
-                remaining.remove(emp2)
-            else:
-                break
-        
-        return pairs
+    async def _fallback_matching(self, participants, seed=None):
+        """
+        Fallback matching при недоступности Java сервиса: локальный движок
+        (matching_engine) в пуле процессов. Пары, уже встречавшиеся в CoffeePair
+        и SecretCoffeeMeeting, не образуются.
+        """
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        # seed в логе позволяет воспроизвести подбор
+        logger.warning(f"🔄 Используется fallback matching (локальный движок, seed={seed})")
+
+        participant_dict = {int(emp.id): emp for emp in participants}
+        engine_participants, exclusions = await sync_to_async(self._engine_input)(participants)
+        scored_pairs = await matching_engine.asolve(engine_participants, exclusions, seed=seed,
+                                                    max_workers=MATCHING_ENGINE_WORKERS, with_scores=True)
+
+        # веса пар — те же оценки, по которым шёл подбор
+        scores = [compatibility.normalize(score) for _, _, score in scored_pairs]
+        logger.info(f"Fallback matching: {len(scored_pairs)} пар из {len(participants)} участников, "
+                    f"средняя совместимость {sum(scores) / len(scores) if scores else 0:.2f}")
+        return [(participant_dict[emp1_id], participant_dict[emp2_id]) for emp1_id, emp2_id, _ in scored_pairs]
+
+    async def build_coffee_pairs(self, secret_coffee, pairs):
+        """
+        Несохранённые CoffeePair для пар подбора [(employee1, employee2), ...]
+        с match_score и match_reason: оценки всех пар считаются одним блочным
+        проходом (compatibility.describe_pairs). Готовы для bulk_create().
+        """
+        pairs = list(pairs)
+        described = await sync_to_async(compatibility.describe_pairs)(pairs)
+        return [
+            CoffeePair(secret_coffee=secret_coffee, employee1=emp1, employee2=emp2,
+                       match_score=score, match_reason=reason)
+            for (emp1, emp2), (score, reason) in zip(pairs, described)
+        ]
+
+    def _engine_input(self, participants):
+        """Признаки участников и жёсткие исключения для matching_engine (читает историю пар из БД)."""
+        ids = [int(emp.id) for emp in participants]
+        exclusions = MatchingServiceClient._load_partner_history(ids)
+        meetings = SecretCoffeeMeeting.objects.filter(
+            Q(employee1_id__in=ids) | Q(employee2_id__in=ids)
+        ).values_list('employee1_id', 'employee2_id')
+        for emp1_id, emp2_id in meetings.iterator():
+            if emp1_id in exclusions:
+                exclusions[emp1_id].add(emp2_id)
+            if emp2_id in exclusions:
+                exclusions[emp2_id].add(emp1_id)
+        return compatibility.participants_from_employees(participants), exclusions
     
     def _fallback_tournament(self, participants, game_type):
         """Fallback создание турнирной сетки"""
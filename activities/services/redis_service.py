@@ -8,11 +8,11 @@ logger = logging.getLogger(__name__)
 class ActivityRedisService:
     """Сервис для работы с Redis в модуле активностей"""
     
-    async def cache_activity_data(self, activity_type, data):
-        """Кэширование данных активности"""
+    async def cache_activity_data(self, activity_type, data, timeout=None):
+        """Кэширование данных активности (timeout в секундах, по умолчанию CACHE_TTL['activities'])"""
         try:
             cache_key = f"activity_{activity_type}_data"
-            cache.set(cache_key, json.dumps(data), CACHE_TTL['activities'])
+            cache.set(cache_key, json.dumps(data), CACHE_TTL['activities'] if timeout is None else timeout)
             return True
         except Exception as e:
             logger.error(f"Ошибка кэширования данных активности: {e}")
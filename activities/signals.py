@@ -0,0 +1,24 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+import logging
+
+from python_app.services import cache_utils
+
+from .models import SecretCoffeeMeeting
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=SecretCoffeeMeeting)
+@receiver(post_delete, sender=SecretCoffeeMeeting)
+def _secret_coffee_meeting_changed(sender, instance: SecretCoffeeMeeting, **kwargs):
+    """Invalidate the Data API previous_matches cache when meeting history changes."""
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not {'employee1', 'employee2', 'created_at'} & set(update_fields):
+        # status/feedback updates do not change who met whom
+        return
+    try:
+        cache_utils.invalidate_data_api_domains(['previous_matches'])
+        logger.info('Signals: invalidated Data API previous_matches generation for SecretCoffeeMeeting %s', getattr(instance, 'id', None))
+    except Exception:
+        logger.exception('Error invalidating Data API cache on secret coffee meeting change')
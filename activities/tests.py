@@ -1,3 +1,300 @@
-from django.test import TestCase
+import random
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from activities.models import ActivityParticipant, ActivitySession, SecretCoffeeMeeting
+from activities.services import compatibility, matching_engine
+from activities.services.anonymous_coffee_service import AnonymousCoffeeService
+from activities.services.java_matching_service import JavaMatchingService
+from activities.services.compatibility import Participant
+from employees.models import CoffeePair, Department, Employee, SecretCoffee
+
+
+def _roster(size, seed=0):
+    rng = random.Random(seed)
+    return [Participant(i, rng.choice([None, 1, 2, 3]), rng.choice([None, 1]), rng.random() < 0.2,
+                        rng.random() < 0.5, rng.getrandbits(rng.choice([4, 70])), rng.choice([-1, 0, 1, 2]))
+            for i in range(1, size + 1)]
+
+
+class MatchingEngineTest(SimpleTestCase):
+    """Локальный движок подбора: исключения, полнота и воспроизводимость."""
+
+    def _check(self, participants, exclusions, pairs):
+        ids = [emp_id for pair in pairs for emp_id in pair]
+        self.assertEqual(len(ids), len(set(ids)))
+        for emp1_id, emp2_id in pairs:
+            self.assertNotIn(emp2_id, exclusions.get(emp1_id, set()))
+            self.assertNotIn(emp1_id, exclusions.get(emp2_id, set()))
+
+    def test_exact_respects_exclusions(self):
+        participants = _roster(6)
+        # 1 уже встречался со всеми, кроме 6
+        exclusions = {1: {2, 3, 4, 5}, 2: {1}, 3: {1}, 4: {1}, 5: {1}}
+        pairs = matching_engine.solve(participants, exclusions, seed=1)
+        self._check(participants, exclusions, pairs)
+        self.assertEqual(len(pairs), 3)
+        self.assertIn((1, 6), [tuple(sorted(pair)) for pair in pairs])
+
+    def test_approx_is_perfect_and_reproducible(self):
+        participants = _roster(400)
+        rng = random.Random(7)
+        exclusions = {}
+        for _ in range(1200):
+            a, b = rng.randrange(1, 401), rng.randrange(1, 401)
+            exclusions.setdefault(a, set()).add(b)
+            exclusions.setdefault(b, set()).add(a)
+        pairs = matching_engine.solve(participants, exclusions, seed=42)
+        self._check(participants, exclusions, pairs)
+        self.assertEqual(len(pairs), 200)
+        self.assertEqual(pairs, matching_engine.solve(list(reversed(participants)), exclusions, seed=42))
+
+    def test_scores_are_pair_weights(self):
+        participants = _roster(40)
+        by_id = {p.id: p for p in participants}
+        scored = matching_engine.solve(participants, seed=5, with_scores=True)
+        self.assertEqual([pair[:2] for pair in scored], matching_engine.solve(participants, seed=5))
+        for emp1_id, emp2_id, score in scored:
+            self.assertAlmostEqual(score, compatibility.pair_score(by_id[emp1_id], by_id[emp2_id]), places=5)
+
+    def test_odd_roster_leaves_one_out(self):
+        pairs = matching_engine.solve(_roster(7), seed=3)
+        self.assertEqual(len(pairs), 3)
+
+    def test_approx_close_to_exact_on_small_rosters(self):
+        # эвристика больших n против точного перебора на тех же малых графах
+        ratios = []
+        for seed in range(60):
+            rng = random.Random(seed)
+            people = _roster(rng.randrange(4, 13), seed)
+            exclusions = {}
+            for _ in range(rng.randrange(len(people) + 1)):
+                a, b = rng.sample([p.id for p in people], 2)
+                exclusions.setdefault(a, set()).add(b)
+                exclusions.setdefault(b, set()).add(a)
+
+            def allowed(i, j):
+                a, b = people[i].id, people[j].id
+                return a != b and b not in exclusions.get(a, ()) and a not in exclusions.get(b, ())
+
+            def weight(i, j):
+                return compatibility.pair_score(people[i], people[j])
+
+            def summary(result):
+                mate, mate_weight = result
+                pairs = [(i, j) for i, j in enumerate(mate) if j > i]
+                self.assertTrue(all(allowed(i, j) for i, j in pairs))
+                for i, j in pairs:
+                    self.assertAlmostEqual(mate_weight[i], weight(i, j), places=5)
+                return len(pairs), sum(weight(i, j) for i, j in pairs)
+
+            exact = summary(matching_engine._solve_exact(len(people), allowed, weight))
+            approx = summary(matching_engine._solve_approx(people, exclusions, allowed, weight, random.Random(seed)))
+            self.assertLessEqual(approx, (exact[0], exact[1] + 1e-9))
+            self.assertEqual(approx[0], exact[0])
+            if exact[1]:
+                ratios.append(approx[1] / exact[1])
+        self.assertGreaterEqual(sum(ratios) / len(ratios), 0.95)
+
+
+class CompatibilityTest(SimpleTestCase):
+    """Векторная блочная матрица совпадает с pair_score."""
+
+    @skipUnless(compatibility.HAS_NUMPY, 'numpy не установлен')
+    def test_blocks_match_scalar_score(self):
+        participants = _roster(90)
+        for r0, c0, tile in compatibility.score_blocks(participants, block_size=32):
+            for i in range(tile.shape[0]):
+                for j in range(tile.shape[1]):
+                    if r0 + i != c0 + j:
+                        self.assertAlmostEqual(float(tile[i, j]),
+                                               compatibility.pair_score(participants[r0 + i], participants[c0 + j]),
+                                               places=5)
+
+    @skipUnless(compatibility.HAS_NUMPY, 'numpy не установлен')
+    def test_top_candidates_skip_exclusions(self):
+        participants = _roster(50)
+        exclusions = {1: {p.id for p in participants[1:40]}}
+        rows = compatibility.top_candidates(participants, 5, exclusions, block_size=16)
+        self.assertTrue({j for j, _ in rows[0]} <= set(range(40, 50)))
+        best = max(compatibility.pair_score(participants[0], p) for p in participants[40:])
+        self.assertAlmostEqual(max(score for _, score in rows[0]), best, places=5)
+
+    def test_pair_scores_match_scalar_score(self):
+        participants = _roster(75)
+        left, right = participants[:37], participants[37:74]
+        for score, a, b in zip(compatibility.pair_scores(left, right, block_size=16), left, right):
+            self.assertAlmostEqual(score, compatibility.pair_score(a, b), places=5)
+
+    def test_explain_is_normalized(self):
+        a = Participant(1, 1, 1, True, False, 0b111, 0)
+        b = Participant(2, 2, 1, False, True, 0b111, 2)
+        score, reasons = compatibility.explain(a, b)
+        self.assertEqual(score, 1.0)
+        self.assertEqual(len(reasons), 5)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class MatchingCacheTest(TestCase):
+    """Кэш результата подбора действует только в пределах недели."""
+
+    def setUp(self):
+        self.service = JavaMatchingService()
+        self.service._client = SimpleNamespace(run_secret_coffee_matching=mock.AsyncMock(
+            return_value=[{'employee1_id': 1, 'employee2_id': 2}]))
+
+    def test_next_week_misses_cache(self):
+        service = self.service
+        participants = [SimpleNamespace(id=1), SimpleNamespace(id=2)]
+        monday = timezone.make_aware(datetime(2026, 3, 2, 10, 0))
+
+        for now, calls in ((monday, 1), (monday + timedelta(days=2), 1), (monday + timedelta(days=7), 2)):
+            with mock.patch('django.utils.timezone.now', return_value=now):
+                pairs = async_to_sync(service.match_coffee_pairs)(participants, shard_by='')
+            self.assertEqual([(a.id, b.id) for a, b in pairs], [(1, 2)])
+            self.assertEqual(service.client.run_secret_coffee_matching.await_count, calls)
+
+    def test_new_meetings_keep_cache(self):
+        # встречи создаются сразу после подбора: повторный запуск той же недели берёт кэш
+        employees = [Employee.objects.create(full_name=f'Employee {i}') for i in range(2)]
+        self.service.client.run_secret_coffee_matching.return_value = [
+            {'employee1_id': employees[0].id, 'employee2_id': employees[1].id}]
+        today = timezone.now().date()
+        session = ActivitySession.objects.create(activity_type='secret_coffee',
+                                                 week_start=today - timedelta(days=today.weekday()))
+
+        async_to_sync(self.service.match_coffee_pairs)(employees, shard_by='')
+        meeting = SecretCoffeeMeeting.objects.create(
+            meeting_id='M-CACHE', activity_session=session, employee1=employees[0], employee2=employees[1],
+            employee1_code='A', employee2_code='B', meeting_format='ONLINE')
+        meeting.status = 'confirmed'
+        meeting.save()
+        pairs = async_to_sync(self.service.match_coffee_pairs)(employees, shard_by='')
+
+        self.assertEqual([(a.id, b.id) for a, b in pairs], [(employees[0].id, employees[1].id)])
+        self.assertEqual(self.service.client.run_secret_coffee_matching.await_count, 1)
+
+    def test_ttl_ends_before_next_week(self):
+        sunday_evening = timezone.make_aware(datetime(2026, 3, 8, 23, 0))
+        with mock.patch('django.utils.timezone.now', return_value=sunday_evening):
+            ttl = JavaMatchingService._matching_cache_ttl(sunday_evening.date() - timedelta(days=6))
+        self.assertEqual(ttl, 3600)
+
+
+async def _pair_in_order(employees):
+    # подбор-заглушка: соседи по списку, последний при нечётном числе остаётся без пары
+    return list(zip(employees[::2], employees[1::2]))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class IncrementalMatchingTest(TestCase):
+    """Инкрементальный подбор: только участники без встречи и только после еженедельного."""
+
+    def setUp(self):
+        today = timezone.now().date()
+        self.session = ActivitySession.objects.create(
+            activity_type='secret_coffee', week_start=today - timedelta(days=today.weekday()), status='active')
+        self.employees = [Employee.objects.create(full_name=f'Employee {i}') for i in range(5)]
+        for employee in self.employees:
+            ActivityParticipant.objects.create(employee=employee, activity_session=self.session)
+        self.paired = SecretCoffeeMeeting.objects.create(
+            meeting_id='M-PAIRED', activity_session=self.session, employee1=self.employees[0],
+            employee2=self.employees[1], employee1_code='A', employee2_code='B', meeting_format='ONLINE')
+
+        self.matcher = mock.AsyncMock(side_effect=_pair_in_order)
+        for target, replacement in (
+                ('activities.services.anonymous_coffee_service.java_matching_service.match_coffee_pairs', self.matcher),
+                ('activities.services.anonymous_coffee_service.AnonymousCoffeeService._send_initial_notifications',
+                 mock.AsyncMock())):
+            patcher = mock.patch(target, replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _run(self):
+        return async_to_sync(AnonymousCoffeeService().run_incremental_matching)()
+
+    def _meeting_ids(self, employee):
+        meetings = SecretCoffeeMeeting.objects.filter(activity_session=self.session)
+        return set(meetings.filter(Q(employee1=employee) | Q(employee2=employee)).values_list('id', flat=True))
+
+    def test_paired_participants_are_left_alone(self):
+        self.assertTrue(self._run())
+        matched = self.matcher.await_args.args[0]
+        self.assertEqual({e.id for e in matched}, {e.id for e in self.employees[2:]})
+        for employee in self.employees[:2]:
+            self.assertEqual(self._meeting_ids(employee), {self.paired.id})
+
+    def test_odd_late_joiner_stays_unpaired(self):
+        self.assertTrue(self._run())
+        self.assertEqual(SecretCoffeeMeeting.objects.filter(activity_session=self.session).count(), 2)
+        unpaired = [e for e in self.employees[2:] if not self._meeting_ids(e)]
+        self.assertEqual(len(unpaired), 1)
+        # один оставшийся участник: подбирать не из кого
+        self.matcher.reset_mock()
+        self.assertFalse(self._run())
+        self.matcher.assert_not_awaited()
+
+    def test_waits_for_weekly_matching(self):
+        self.session.status = 'planned'
+        self.session.save()
+        self.assertFalse(self._run())
+        self.matcher.assert_not_awaited()
+        self.assertEqual(SecretCoffeeMeeting.objects.count(), 1)
+
+
+class CoffeePairScoreTest(TestCase):
+    """match_score и match_reason задаются при подборе, а не в CoffeePair.save()."""
+
+    def setUp(self):
+        departments = [Department.objects.create(name=f'Dept {i}', code=f'D{i}') for i in range(2)]
+        self.employees = [Employee.objects.create(full_name=f'Employee {i}', department=departments[i % 2])
+                          for i in range(4)]
+        self.session = SecretCoffee.objects.create(week_start=date(2026, 3, 2))
+
+    def test_build_coffee_pairs_scores_every_pair(self):
+        pairs = [(self.employees[0], self.employees[1]), (self.employees[2], self.employees[3])]
+        built = async_to_sync(JavaMatchingService().build_coffee_pairs)(self.session, pairs)
+        features = {p.id: p for p in compatibility.participants_from_employees(self.employees)}
+        for coffee_pair, (emp1, emp2) in zip(built, pairs):
+            self.assertIsNone(coffee_pair.pk)
+            score, reasons = compatibility.explain(features[emp1.id], features[emp2.id])
+            self.assertEqual(coffee_pair.match_score, score)
+            self.assertEqual(coffee_pair.match_reason, '; '.join(reasons))
+        CoffeePair.objects.bulk_create(built)
+        self.assertEqual(CoffeePair.objects.filter(secret_coffee=self.session, match_score__gt=0).count(), 2)
+
+    def test_save_keeps_given_score(self):
+        pair = CoffeePair.objects.create(secret_coffee=self.session, employee1=self.employees[0],
+                                         employee2=self.employees[1])
+        self.assertEqual(pair.match_score, 0.0)
+        self.assertEqual(pair.match_reason, '')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class MeetingSignalTest(TestCase):
+    """previous_matches инвалидируется только при изменении состава встреч."""
+
+    def test_status_update_keeps_generation(self):
+        employees = [Employee.objects.create(full_name=f'Employee {i}') for i in range(2)]
+        today = timezone.now().date()
+        session = ActivitySession.objects.create(activity_type='secret_coffee',
+                                                 week_start=today - timedelta(days=today.weekday()))
+        with mock.patch('python_app.services.cache_utils.invalidate_data_api_domains') as invalidate:
+            meeting = SecretCoffeeMeeting.objects.create(
+                meeting_id='M-SIGNAL', activity_session=session, employee1=employees[0], employee2=employees[1],
+                employee1_code='A', employee2_code='B', meeting_format='ONLINE')
+            self.assertEqual(invalidate.call_count, 1)
+            meeting.status = 'failed'
+            meeting.save(update_fields=['status', 'updated_at'])
+            self.assertEqual(invalidate.call_count, 1)
+            meeting.employee2 = employees[0]
+            meeting.save(update_fields=['employee2'])
+            self.assertEqual(invalidate.call_count, 2)
+            meeting.delete()
+            self.assertEqual(invalidate.call_count, 3)
@@ -7,11 +7,17 @@ logger = logging.getLogger(__name__)
 class Command(BaseCommand):
     help = 'Запускает процесс подбора пар "Секретный кофе" через новый API-клиент.'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--shard-by', choices=['business_center', 'department'], default=None,
+            help='Подбор по шардам (параллельные запросы); по умолчанию MATCHING_SHARD_BY из настроек.',
+        )
+
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS("Начинаем подбор пар для 'Секретного кофе'..."))
         
         try:
-            pairs = run_matching_for_active_employees()
+            pairs = run_matching_for_active_employees(shard_by=options.get('shard_by'))
             
             if pairs is None:
                 self.stdout.write(self.style.ERROR("Произошла ошибка во время подбора. См. логи для деталей."))
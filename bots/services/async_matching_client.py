@@ -0,0 +1,308 @@
+"""
+Асинхронный клиент Java-сервиса подбора пар.
+
+Работает поверх одного долгоживущего aiohttp.ClientSession на event loop
+(пул keep-alive соединений), делает retry с бэкоффом через asyncio.sleep и
+не занимает потоки исполнителя на время ожидания ответа. Circuit breaker,
+in-memory и Prometheus-метрики общие с синхронным MatchingServiceClient.
+
+run_sharded_matching() — опциональный режим подбора по шардам (бизнес-центр
+или отдел) с параллельной отправкой запросов и общим проходом для остатков.
+"""
+import json
+import random
+import asyncio
+import logging
+import weakref
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from bots.services.circuit_breaker import OPEN
+from bots.services.matching_service_client import MatchingServiceClient, get_default_client
+
+try:
+    from prometheus_client import Histogram
+    _HAS_PROM = True
+except Exception:
+    _HAS_PROM = False
+
+logger = logging.getLogger(__name__)
+
+# Режимы шардирования подбора: имя -> атрибут Employee (id внешнего ключа, без запросов к БД)
+SHARD_KEYS = {
+    'business_center': 'business_center_id',
+    'department': 'department_id',
+}
+# Шард для остатков, не попавших в пары внутри своих шардов
+CROSS_SHARD = 'cross_shard'
+
+if _HAS_PROM:
+    PROM_SHARD_LATENCY = Histogram('matching_service_shard_latency_seconds',
+                                   'Matching request latency per shard in seconds', ['shard_by', 'shard'])
+else:
+    PROM_SHARD_LATENCY = None
+
+
+def partition_participants(employees, shard_by: str) -> Dict[str, list]:
+    """
+    Делит участников на шарды по бизнес-центру или отделу.
+
+    Сотрудники без бизнес-центра/отдела попадают в шард 'none'.
+    """
+    attr = SHARD_KEYS.get(shard_by)
+    if attr is None:
+        raise ValueError(f"Неизвестный режим шардирования: {shard_by!r} (допустимо: {', '.join(SHARD_KEYS)})")
+    shards: Dict[str, list] = {}
+    for emp in employees:
+        key = getattr(emp, attr, None)
+        shards.setdefault('none' if key is None else str(key), []).append(emp)
+    return shards
+
+
+class AsyncMatchingServiceClient:
+    """
+    Асинхронный клиент для Java-сервиса подбора пар.
+
+    Сессии создаются лениво, по одной на event loop, и живут до close().
+    Формирование запроса (история пар из БД), breaker и счётчики берутся у
+    синхронного клиента (по умолчанию — get_default_client()).
+    """
+
+    def __init__(self, sync_client: Optional[MatchingServiceClient] = None):
+        self._sync = sync_client if sync_client is not None else get_default_client()
+        self.base_url = self._sync.base_url
+        self.timeout = aiohttp.ClientTimeout(total=self._sync.timeout)
+        self.breaker = self._sync.breaker
+        # тот же словарь, что у синхронного клиента: /metrics/internal видит оба
+        self.metrics = self._sync.metrics
+        self._sessions = weakref.WeakKeyDictionary()
+
+    def _session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=getattr(settings, 'MATCHING_SERVICE_POOL_MAXSIZE', 10),
+                limit_per_host=getattr(settings, 'MATCHING_SERVICE_POOL_MAXSIZE', 10),
+            )
+            trace = aiohttp.TraceConfig()
+            trace.on_connection_create_end.append(self._on_connection_created)
+            trace.on_connection_reuseconn.append(self._on_connection_reused)
+            session = aiohttp.ClientSession(connector=connector, timeout=self.timeout, trace_configs=[trace])
+            self._sessions[loop] = session
+        return session
+
+    async def _on_connection_created(self, session, ctx, params):
+        self._sync._record_connection(reused=False)
+
+    async def _on_connection_reused(self, session, ctx, params):
+        self._sync._record_connection(reused=True)
+
+    async def close(self) -> None:
+        """Закрывает сессию текущего event loop."""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None and not session.closed:
+            await session.close()
+
+    async def request_json(self, method: str, path: str, payload: Any = None, max_retries: int = 3,
+                           backoff_factor: float = 0.5, use_breaker: bool = True) -> Optional[Tuple[int, Any]]:
+        """
+        HTTP-запрос к сервису с retry, экспоненциальным бэкоффом и jitter.
+        Повторяются сетевые ошибки и ответы 5xx; 4xx возвращается сразу.
+
+        Returns:
+            (status, body) — body разобран как JSON, если это возможно, иначе текст;
+            None, если все попытки провалились или circuit breaker открыт.
+        """
+        url = f"{self.base_url}{path}"
+        attempt = 0
+        while attempt < max_retries:
+            if use_breaker and not self.breaker.allow_request():
+                logger.warning(f"Request to {url} skipped: circuit breaker is {self.breaker.state}")
+                return None
+            try:
+                async with self._session().request(method.upper(), url, json=payload) as response:
+                    text = await response.text()
+                    status = response.status
+            except Exception as e:
+                if use_breaker:
+                    self.breaker.record_failure()
+                error = e
+            else:
+                if use_breaker:
+                    # 5xx — сбой сервиса; 4xx — ошибка запроса, сервис жив
+                    if status >= 500:
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.record_success()
+                try:
+                    body = json.loads(text)
+                except ValueError:
+                    body = text
+                # 5xx повторяем, пока есть попытки и breaker не открылся
+                if status < 500 or attempt + 1 >= max_retries or (use_breaker and self.breaker.state == OPEN):
+                    return status, body
+                error = f"HTTP {status}"
+            attempt += 1
+            if attempt >= max_retries:
+                logger.error(f"Request to {url} failed after {attempt} attempts: {error}")
+                return None
+            if use_breaker and self.breaker.state == OPEN:
+                logger.error(f"Request to {url} failed after {attempt} attempts, circuit breaker opened: {error}")
+                return None
+            sleep_time = backoff_factor * (2 ** (attempt - 1))
+            logger.warning(f"Request to {url} failed (attempt {attempt}/{max_retries}), retrying: {error}")
+            await asyncio.sleep(sleep_time + random.uniform(0, sleep_time * 0.1))
+        return None
+
+    async def check_health(self) -> bool:
+        """Асинхронный аналог MatchingServiceClient.check_health (проба в обход breaker)."""
+        self.metrics['health_checks'] += 1
+        if self._sync.prom_health_checks:
+            self._sync.prom_health_checks.inc()
+        result = await self.request_json('get', '/api/v1/matching/health', use_breaker=False)
+        is_healthy = bool(result) and result[0] == 200 and isinstance(result[1], dict) \
+            and result[1].get('status') == 'OK'
+        if is_healthy:
+            self.breaker.record_success()
+        else:
+            logger.error(f"Сервис подбора пар не прошёл проверку здоровья: {result!r}")
+            self.metrics['health_failures'] += 1
+            if self._sync.prom_health_failures:
+                self._sync.prom_health_failures.inc()
+            self.breaker.record_failure()
+        return is_healthy
+
+    async def run_secret_coffee_matching(self, employees,
+                                         partners: Optional[Dict[int, set]] = None) -> Optional[List[Dict[str, int]]]:
+        """
+        Асинхронный аналог MatchingServiceClient.run_secret_coffee_matching.
+        partners — уже загруженная история пар (см. _prepare_request_data).
+
+        Returns:
+            Список словарей с ID пар или None в случае ошибки.
+        """
+        self._sync.start_health_monitor()
+        if self.breaker.state == OPEN:
+            logger.error("Запуск подбора невозможен: сервис подбора пар недоступен (circuit breaker открыт).")
+            self.metrics['matching_failures'] += 1
+            return None
+
+        # история пар читается из БД — в синхронном потоке Django
+        request_data = await sync_to_async(self._sync._prepare_request_data)(employees, partners)
+        self.metrics['matching_requests'] += 1
+        if self._sync.prom_matching_requests:
+            self._sync.prom_matching_requests.inc()
+        logger.info(f"Отправка запроса на подбор для {len(request_data['employees'])} сотрудников в Java-сервис.")
+
+        start = perf_counter()
+        result = await self.request_json('post', '/api/v1/matching/match/secret-coffee', request_data)
+        elapsed_ms = (perf_counter() - start) * 1000.0
+
+        if result is None or result[0] != 200 or not isinstance(result[1], dict):
+            logger.error(f"Сервис подбора пар не вернул результат: {result[0] if result else 'нет ответа'}")
+            self.metrics['matching_failures'] += 1
+            if self._sync.prom_matching_failures:
+                self._sync.prom_matching_failures.inc()
+            return None
+
+        pairs = result[1].get('pairs')
+        self.metrics['matching_latency_ms_total'] += elapsed_ms
+        if pairs:
+            self.metrics['matching_requests_success'] += 1
+        if self._sync.prom_matching_latency:
+            self._sync.prom_matching_latency.observe(elapsed_ms / 1000.0)
+        logger.info(f"Сервис подбора пар вернул {len(pairs) if pairs else 0} пар.")
+        return pairs
+
+    async def run_sharded_matching(self, employees, shard_by: str) -> Optional[List[Dict[str, int]]]:
+        """
+        Подбор по шардам: участники делятся по бизнес-центру или отделу
+        (partition_participants), запросы по шардам уходят параллельно (не больше
+        MATCHING_SHARD_CONCURRENCY одновременно), результаты объединяются.
+
+        Оставшиеся без пары (нечётные шарды, шарды из одного человека и шарды,
+        запрос по которым не удался) подбираются одним общим запросом.
+        Время каждого шарда пишется в лог, в metrics['last_sharded_run'] и в
+        Prometheus (matching_service_shard_latency_seconds).
+
+        Returns:
+            Список словарей с ID пар или None, если не удался ни один запрос.
+        """
+        employees = list(employees)
+        shards = partition_participants(employees, shard_by)
+        # история пар читается один раз на все шарды
+        partners = await sync_to_async(self._sync._load_partner_history)([emp.id for emp in employees])
+        limit = asyncio.Semaphore(max(1, int(getattr(settings, 'MATCHING_SHARD_CONCURRENCY', 8))))
+        timings: Dict[str, Dict[str, Any]] = {}
+
+        async def _run_shard(key: str, members: list) -> Optional[List[Dict[str, int]]]:
+            if len(members) < 2:
+                return []
+            async with limit:
+                start = perf_counter()
+                shard_pairs = await self.run_secret_coffee_matching(members, partners)
+                elapsed = perf_counter() - start
+            timings[key] = {
+                'participants': len(members),
+                'pairs': len(shard_pairs or []),
+                'ok': shard_pairs is not None,
+                'latency_ms': round(elapsed * 1000.0, 1),
+            }
+            logger.info(f"Шард {shard_by}={key}: {len(members)} участников, "
+                        f"{len(shard_pairs or [])} пар за {elapsed * 1000.0:.0f} мс"
+                        f"{'' if shard_pairs is not None else ' (ошибка)'}")
+            if PROM_SHARD_LATENCY:
+                PROM_SHARD_LATENCY.labels(shard_by=shard_by, shard=key).observe(elapsed)
+            return shard_pairs
+
+        keys = list(shards)
+        results = await asyncio.gather(*(_run_shard(key, shards[key]) for key in keys))
+
+        known_ids = {emp.id for emp in employees}
+        paired = set()
+        pairs: List[Dict[str, int]] = []
+        any_ok = False
+
+        def _merge(shard_pairs):
+            for pair in shard_pairs:
+                emp1_id, emp2_id = int(pair['employee1_id']), int(pair['employee2_id'])
+                # сотрудник не может оказаться в двух парах
+                if emp1_id == emp2_id or not {emp1_id, emp2_id} <= known_ids or paired & {emp1_id, emp2_id}:
+                    continue
+                paired.update((emp1_id, emp2_id))
+                pairs.append(pair)
+
+        for key, shard_pairs in zip(keys, results):
+            if shard_pairs is not None:
+                any_ok = any_ok or len(shards[key]) >= 2
+                _merge(shard_pairs)
+
+        leftovers = [emp for emp in employees if emp.id not in paired]
+        if len(leftovers) >= 2:
+            cross_pairs = await _run_shard(CROSS_SHARD, leftovers)
+            if cross_pairs is not None:
+                any_ok = True
+                _merge(cross_pairs)
+
+        self.metrics['last_sharded_run'] = {'shard_by': shard_by, 'shards': timings}
+        logger.info(f"Подбор по шардам ({shard_by}): {len(shards)} шардов, {len(pairs)} пар, "
+                    f"без пары {len(employees) - len(paired)}.")
+        if not any_ok and timings:
+            return None
+        return pairs
+
+
+# Module-level singleton, как get_default_client() для синхронного клиента.
+_DEFAULT_ASYNC_CLIENT = None
+
+
+def get_default_async_client() -> AsyncMatchingServiceClient:
+    global _DEFAULT_ASYNC_CLIENT
+    if _DEFAULT_ASYNC_CLIENT is None:
+        _DEFAULT_ASYNC_CLIENT = AsyncMatchingServiceClient()
+    return _DEFAULT_ASYNC_CLIENT
@@ -0,0 +1,128 @@
+"""
+Circuit breaker для вызовов внешних сервисов (Java matching-сервис).
+
+Состояния:
+    closed    — запросы идут как обычно, считаются подряд идущие ошибки;
+    open      — после failure_threshold ошибок подряд запросы сразу отклоняются
+                (fail fast) в течение reset_timeout секунд;
+    half_open — по истечении reset_timeout пропускается один пробный запрос:
+                успех закрывает breaker, ошибка снова открывает.
+
+Состояние и переходы экспортируются в Prometheus (если установлен prometheus_client).
+"""
+import logging
+import threading
+from time import monotonic
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+try:
+    from prometheus_client import Counter, Gauge
+    _HAS_PROM = True
+except Exception:
+    _HAS_PROM = False
+
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+
+# числовое значение состояния для gauge
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+if _HAS_PROM:
+    PROM_BREAKER_STATE = Gauge('circuit_breaker_state', 'Circuit breaker state (0=closed, 1=half_open, 2=open)', ['name'])
+    PROM_BREAKER_TRANSITIONS = Counter('circuit_breaker_transitions_total', 'Circuit breaker state transitions',
+                                       ['name', 'from_state', 'to_state'])
+    PROM_BREAKER_REJECTED = Counter('circuit_breaker_rejected_total', 'Calls rejected by an open circuit breaker', ['name'])
+else:
+    PROM_BREAKER_STATE = PROM_BREAKER_TRANSITIONS = PROM_BREAKER_REJECTED = None
+
+
+class CircuitBreaker:
+    """Потокобезопасный circuit breaker; см. описание модуля."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        if PROM_BREAKER_STATE:
+            PROM_BREAKER_STATE.labels(name=name).set(_STATE_VALUES[CLOSED])
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def allow_request(self) -> bool:
+        """
+        Можно ли выполнить запрос сейчас.
+
+        В half_open пропускает только один пробный запрос, пока не придёт
+        record_success()/record_failure().
+        """
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+        if PROM_BREAKER_REJECTED:
+            PROM_BREAKER_REJECTED.labels(name=self.name).inc()
+        return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            if self._state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._probe_in_flight = False
+            self._failures += 1
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                self._opened_at = monotonic()
+                self._transition(OPEN)
+
+    def snapshot(self) -> Dict[str, object]:
+        """Текущее состояние для логов и in-memory метрик."""
+        with self._lock:
+            self._maybe_half_open()
+            return {'state': self._state, 'consecutive_failures': self._failures}
+
+    def _maybe_half_open(self) -> None:
+        # вызывается под self._lock
+        if self._state == OPEN and monotonic() - self._opened_at >= self.reset_timeout:
+            self._transition(HALF_OPEN)
+
+    def _transition(self, to_state: str) -> None:
+        # вызывается под self._lock
+        from_state, self._state = self._state, to_state
+        logger.warning("Circuit breaker '%s': %s -> %s", self.name, from_state, to_state)
+        if PROM_BREAKER_STATE:
+            PROM_BREAKER_STATE.labels(name=self.name).set(_STATE_VALUES[to_state])
+        if PROM_BREAKER_TRANSITIONS:
+            PROM_BREAKER_TRANSITIONS.labels(name=self.name, from_state=from_state, to_state=to_state).inc()
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def get_breaker(name: str, failure_threshold: int = 5, reset_timeout: float = 30.0) -> CircuitBreaker:
+    """Общий на процесс breaker с данным именем (параметры берутся при первом создании)."""
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+            _BREAKERS[name] = breaker
+        return breaker
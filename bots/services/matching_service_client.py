@@ -1,14 +1,18 @@
 import logging
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 from typing import List, Dict, Any, Optional, Tuple
 import time
 import random
 import json
 from time import perf_counter
 
+from asgiref.sync import async_to_sync
 from django.conf import settings
-from django.db import models
+from django.db.models import Q
 from employees.models import Employee, CoffeePair
+from bots.services.circuit_breaker import get_breaker, OPEN
 
 # Optional Prometheus integration
 try:
@@ -19,16 +23,88 @@ except Exception:
 
 logger = logging.getLogger(__name__)
 
+if _HAS_PROM:
+    # Общие для синхронного и асинхронного клиентов
+    PROM_HEALTH_CHECKS = Counter('matching_service_health_checks_total', 'Total health checks performed')
+    PROM_HEALTH_FAILURES = Counter('matching_service_health_failures_total', 'Total health check failures')
+    PROM_MATCHING_REQUESTS = Counter('matching_service_matching_requests_total', 'Total matching requests')
+    PROM_MATCHING_FAILURES = Counter('matching_service_matching_failures_total', 'Total matching failures')
+    # histogram for latency in seconds
+    PROM_MATCHING_LATENCY = Histogram('matching_service_matching_latency_seconds', 'Matching request latency in seconds')
+    PROM_HTTP_CONNECTIONS = Counter('matching_service_http_requests_total',
+                                    'HTTP requests to the matching service by connection reuse', ['reused'])
+else:
+    PROM_HEALTH_CHECKS = PROM_HEALTH_FAILURES = None
+    PROM_MATCHING_REQUESTS = PROM_MATCHING_FAILURES = None
+    PROM_MATCHING_LATENCY = None
+    PROM_HTTP_CONNECTIONS = None
+
+
+# Общая на процесс HTTP-сессия: пул keep-alive соединений к Java-сервису.
+_SHARED_SESSION = None
+_SHARED_SESSION_LOCK = threading.Lock()
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=getattr(settings, 'MATCHING_SERVICE_POOL_CONNECTIONS', 4),
+        pool_maxsize=getattr(settings, 'MATCHING_SERVICE_POOL_MAXSIZE', 10),
+        pool_block=getattr(settings, 'MATCHING_SERVICE_POOL_BLOCK', False),
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_shared_session() -> requests.Session:
+    """Возвращает общую для процесса сессию с пулом соединений (создаётся при первом вызове)."""
+    global _SHARED_SESSION
+    if _SHARED_SESSION is None:
+        with _SHARED_SESSION_LOCK:
+            if _SHARED_SESSION is None:
+                _SHARED_SESSION = _build_session()
+    return _SHARED_SESSION
+
+
+def position_level(position: Optional[str]) -> str:
+    """
+    Уровень должности по названию: SENIOR, MID, JUNIOR или UNKNOWN (должность не указана).
+    """
+    if not position:
+        return 'UNKNOWN'
+    # position may contain a full title; naive mapping by keywords
+    pos = position.lower()
+    if 'senior' in pos or 'lead' in pos or 'principal' in pos:
+        return 'SENIOR'
+    if 'junior' in pos or 'intern' in pos:
+        return 'JUNIOR'
+    return 'MID'
+
+
+# Фоновые проверки здоровья: один поток на base_url в процессе.
+_HEALTH_MONITORS: Dict[str, threading.Thread] = {}
+_HEALTH_MONITORS_LOCK = threading.Lock()
+
+
 class MatchingServiceClient:
     """
     Клиент для взаимодействия с внешним Java-сервисом подбора пар.
     """
 
-    def __init__(self):
+    def __init__(self, session: Optional[requests.Session] = None):
         self.base_url = settings.MATCHING_SERVICE_URL
         if not self.base_url:
             raise ValueError("MATCHING_SERVICE_URL не определен в настройках Django.")
         self.timeout = settings.MATCHING_SERVICE_TIMEOUT
+        # По умолчанию все клиенты процесса используют одну сессию с пулом соединений
+        self.session = session if session is not None else get_shared_session()
+        # Общий на процесс breaker: пока он открыт, вызовы сразу завершаются ошибкой
+        self.breaker = get_breaker(
+            'matching_service',
+            failure_threshold=getattr(settings, 'MATCHING_SERVICE_BREAKER_FAILURES', 5),
+            reset_timeout=getattr(settings, 'MATCHING_SERVICE_BREAKER_RESET_SECONDS', 30),
+        )
         # Простые in-memory метрики
         # counters: health_checks, health_failures, matching_requests, matching_failures
         # timing: matching_latency_ms_total, matching_requests_success
@@ -39,42 +115,37 @@ class MatchingServiceClient:
             'matching_failures': 0,
             'matching_latency_ms_total': 0.0,
             'matching_requests_success': 0,
+            'http_connections_opened': 0,
+            'http_connections_reused': 0,
         }
 
-        # Prometheus metrics (optional). Register only if prometheus_client is available.
-        self.prom = None
-        if _HAS_PROM:
-            try:
-                # Use safe registration: if already created elsewhere, this may raise; ignore then
-                self.prom_health_checks = Counter('matching_service_health_checks_total', 'Total health checks performed')
-                self.prom_health_failures = Counter('matching_service_health_failures_total', 'Total health check failures')
-                self.prom_matching_requests = Counter('matching_service_matching_requests_total', 'Total matching requests')
-                self.prom_matching_failures = Counter('matching_service_matching_failures_total', 'Total matching failures')
-                # histogram for latency in seconds
-                self.prom_matching_latency = Histogram('matching_service_matching_latency_seconds', 'Matching request latency in seconds')
-                self.prom = True
-            except Exception:
-                # If metrics are already registered or any other error, fall back to in-memory only
-                self.prom = False
-                self.prom_health_checks = None
-                self.prom_health_failures = None
-                self.prom_matching_requests = None
-                self.prom_matching_failures = None
-                self.prom_matching_latency = None
-        else:
-            self.prom_health_checks = None
-            self.prom_health_failures = None
-            self.prom_matching_requests = None
-            self.prom_matching_failures = None
-            self.prom_matching_latency = None
+        # Prometheus metrics (optional): registered once per process at module level,
+        # so every client instance reports to the same series.
+        self.prom = _HAS_PROM
+        self.prom_health_checks = PROM_HEALTH_CHECKS
+        self.prom_health_failures = PROM_HEALTH_FAILURES
+        self.prom_matching_requests = PROM_MATCHING_REQUESTS
+        self.prom_matching_failures = PROM_MATCHING_FAILURES
+        self.prom_matching_latency = PROM_MATCHING_LATENCY
 
     def check_health(self) -> bool:
         """
         Проверяет состояние здоровья Java-сервиса.
 
+        Выполняется в обход circuit breaker (это и есть проба) и передаёт
+        результат в breaker: успех закрывает его, ошибка считается сбоем.
+
         Returns:
             bool: True, если сервис доступен и отвечает "OK".
         """
+        is_healthy = self._probe_health()
+        if is_healthy:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        return is_healthy
+
+    def _probe_health(self) -> bool:
         try:
             url = f"{self.base_url}/api/v1/matching/health"
             self.metrics['health_checks'] += 1
@@ -83,7 +154,7 @@ class MatchingServiceClient:
                     self.prom_health_checks.inc()
                 except Exception:
                     pass
-            response = self._request_with_retry('get', url, timeout=self.timeout)
+            response = self._request_with_retry('get', url, use_breaker=False, timeout=self.timeout)
             if response is None:
                 logger.error("Ошибка при проверке состояния сервиса подбора пар: нет ответа после retry")
                 self.metrics['health_failures'] += 1
@@ -115,8 +186,11 @@ class MatchingServiceClient:
             Список словарей с ID пар, например, [{'employee1_id': 1, 'employee2_id': 2}],
             или None в случае ошибки.
         """
-        if not self.check_health():
-            logger.error("Запуск подбора невозможен: сервис подбора пар недоступен.")
+        # Здоровье проверяется в фоне; пока breaker открыт — fail fast без сетевых вызовов
+        self.start_health_monitor()
+        if self.breaker.state == OPEN:
+            logger.error("Запуск подбора невозможен: сервис подбора пар недоступен (circuit breaker открыт).")
+            self.metrics['matching_failures'] += 1
             return None
 
         try:
@@ -177,34 +251,22 @@ class MatchingServiceClient:
             logger.error(f"Неожиданная ошибка при обработке ответа от сервиса подбора пар: {e}")
             return None
 
-    def _prepare_request_data(self, employees: List[Employee]) -> Dict[str, List[Dict[str, Any]]]:
+    def _prepare_request_data(self, employees: List[Employee],
+                              partners: Optional[Dict[int, set]] = None) -> Dict[str, List[Dict[str, Any]]]:
         """
         Преобразует список Django-моделей в структуру для JSON-запроса.
+
+        Число запросов к БД не зависит от размера списка: история пар читается
+        одним запросом, отдел берётся из department_id (без обращения к Department).
+        Уже загруженную историю (_load_partner_history) можно передать в partners —
+        тогда запросов к БД нет совсем.
         """
+        employees = list(employees)
+        if partners is None:
+            partners = self._load_partner_history(emp.id for emp in employees)
+
         employee_dtos = []
         for emp in employees:
-            # Получаем ID партнеров, с которыми сотрудник уже был в паре (история CoffeePair)
-            partner_ids = set()
-            related_pairs = CoffeePair.objects.filter(models.Q(employee1_id=emp.id) | models.Q(employee2_id=emp.id))
-            for cp in related_pairs:
-                if cp.employee1_id and cp.employee1_id != emp.id:
-                    partner_ids.add(cp.employee1_id)
-                if cp.employee2_id and cp.employee2_id != emp.id:
-                    partner_ids.add(cp.employee2_id)
-            excluded_partners = list(partner_ids)
-            
-            # position may contain a full title; send a simple level indicator if available
-            position_level = None
-            if getattr(emp, 'position', None):
-                # naive mapping: look for keywords in position to determine level
-                pos = emp.position.lower()
-                if 'senior' in pos or 'lead' in pos or 'principal' in pos:
-                    position_level = 'SENIOR'
-                elif 'junior' in pos or 'intern' in pos:
-                    position_level = 'JUNIOR'
-                else:
-                    position_level = 'MID'
-
             preferences_with_newcomers = False
             profile = getattr(emp, 'profile', None)
             if profile is not None and hasattr(profile, 'with_newcomers'):
@@ -215,43 +277,124 @@ class MatchingServiceClient:
 
             dto = {
                 "id": emp.id,
-                "department": emp.department.id if getattr(emp, 'department', None) else None,
-                "position_level": position_level or 'UNKNOWN',
-                "excluded_partners": excluded_partners,
+                "department": getattr(emp, 'department_id', None),
+                "position_level": position_level(getattr(emp, 'position', None)),
+                "excluded_partners": sorted(partners.get(emp.id, ())),
                 "preferences": {
                     "with_newcomers": preferences_with_newcomers
                 }
             }
             employee_dtos.append(dto)
-        
+
         return {"employees": employee_dtos}
 
-    def _request_with_retry(self, method: str, url: str, max_retries: int = 3, backoff_factor: float = 0.5, **kwargs):
+    @staticmethod
+    def _load_partner_history(employee_ids) -> Dict[int, set]:
+        """
+        Карта смежности партнёров: id сотрудника -> id всех, с кем он уже был в паре
+        (история CoffeePair). Читается одним запросом и только для переданных
+        сотрудников: объём пропорционален им, а не всей истории.
+        """
+        partners = {emp_id: set() for emp_id in employee_ids}
+        history = CoffeePair.objects.filter(
+            Q(employee1_id__in=list(partners)) | Q(employee2_id__in=list(partners))
+        ).values_list('employee1_id', 'employee2_id')
+        for emp1_id, emp2_id in history.iterator():
+            if emp1_id == emp2_id:
+                continue
+            if emp1_id in partners and emp2_id:
+                partners[emp1_id].add(emp2_id)
+            if emp2_id in partners and emp1_id:
+                partners[emp2_id].add(emp1_id)
+        return partners
+
+    def _request_with_retry(self, method: str, url: str, max_retries: int = 3, backoff_factor: float = 0.5,
+                            use_breaker: bool = True, **kwargs):
         """
         Простая реализация retry с экспоненциальным бэкоффом и jitter.
         Возвращает объект Response при успешном ответе или None, если все попытки провалились.
+        С use_breaker каждая попытка проходит через circuit breaker: если он открылся,
+        оставшиеся попытки не выполняются.
         """
         attempt = 0
         while attempt < max_retries:
+            if use_breaker and not self.breaker.allow_request():
+                logger.warning(f"Request to {url} skipped: circuit breaker is {self.breaker.state}")
+                return None
             try:
-                if method.lower() == 'get':
-                    resp = requests.get(url, **kwargs)
-                elif method.lower() == 'post':
-                    resp = requests.post(url, **kwargs)
-                else:
+                if method.lower() not in ('get', 'post'):
                     raise ValueError(f"Unsupported method for retry: {method}")
+                pool = self._connection_pool(url)
+                opened_before = pool.num_connections if pool is not None else None
+                resp = self.session.request(method.upper(), url, **kwargs)
+                if pool is not None:
+                    self._record_connection(reused=pool.num_connections == opened_before)
+                if use_breaker:
+                    # 5xx — сбой сервиса; 4xx — ошибка запроса, сервис жив
+                    if resp.status_code >= 500:
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.record_success()
                 return resp
             except Exception as e:
                 # Любое исключение (включая RequestException и мок-исключения) должно обрабатываться
+                if use_breaker:
+                    self.breaker.record_failure()
                 attempt += 1
                 if attempt >= max_retries:
                     logger.error(f"Request to {url} failed after {attempt} attempts: {e}")
                     return None
+                if use_breaker and self.breaker.state == OPEN:
+                    # не спим в бэкоффе, если сервис уже признан недоступным
+                    logger.error(f"Request to {url} failed after {attempt} attempts, circuit breaker opened: {e}")
+                    return None
                 # backoff with jitter
                 sleep_time = backoff_factor * (2 ** (attempt - 1))
                 jitter = random.uniform(0, sleep_time * 0.1)
                 time.sleep(sleep_time + jitter)
 
+    def start_health_monitor(self) -> None:
+        """
+        Запускает (один раз на процесс и base_url) фоновый поток, который каждые
+        MATCHING_SERVICE_HEALTH_INTERVAL секунд вызывает check_health() и так
+        обновляет состояние circuit breaker.
+        """
+        interval = float(getattr(settings, 'MATCHING_SERVICE_HEALTH_INTERVAL', 15))
+        if interval <= 0:
+            return
+        with _HEALTH_MONITORS_LOCK:
+            thread = _HEALTH_MONITORS.get(self.base_url)
+            if thread is not None and thread.is_alive():
+                return
+
+            def _loop():
+                while True:
+                    try:
+                        self.check_health()
+                    except Exception:
+                        logger.exception("Фоновая проверка здоровья сервиса подбора пар завершилась ошибкой")
+                    time.sleep(interval)
+
+            thread = threading.Thread(target=_loop, name='matching-service-health', daemon=True)
+            _HEALTH_MONITORS[self.base_url] = thread
+            thread.start()
+
+    def _connection_pool(self, url: str):
+        """urllib3-пул сессии для url (для метрики переиспользования соединений) или None."""
+        try:
+            return self.session.get_adapter(url).poolmanager.connection_from_url(url)
+        except Exception:
+            return None
+
+    def _record_connection(self, reused: bool) -> None:
+        # пул не открыл новое соединение -> запрос ушёл по keep-alive
+        self.metrics['http_connections_reused' if reused else 'http_connections_opened'] += 1
+        if PROM_HTTP_CONNECTIONS:
+            try:
+                PROM_HTTP_CONNECTIONS.labels(reused='true' if reused else 'false').inc()
+            except Exception:
+                pass
+
     def _sanitize_request_for_logging(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Возвращает безопасную для логирования версию payload: удаляет/сводит к минимуму PII.
@@ -271,27 +414,39 @@ class MatchingServiceClient:
     def get_metrics(self) -> Dict[str, Any]:
         """Возвращает текущее состояние простых in-memory метрик."""
         # Небольшая копия, чтобы внешний код не мог изменять внутренний словарь напрямую
-        return dict(self.metrics)
+        out = dict(self.metrics)
+        out['circuit_breaker'] = self.breaker.snapshot()
+        return out
 
-def run_matching_for_active_employees() -> Optional[List[Tuple[int, int]]]:
+def run_matching_for_active_employees(shard_by: Optional[str] = None) -> Optional[List[Tuple[int, int]]]:
     """
     Основная функция-фасад для запуска подбора.
     Собирает активных сотрудников и вызывает клиент.
+
+    Args:
+        shard_by: 'business_center' или 'department' — подбор по шардам
+            (параллельные запросы, см. AsyncMatchingServiceClient.run_sharded_matching);
+            по умолчанию берётся из settings.MATCHING_SHARD_BY, пустое значение — один общий запрос.
     """
     logger.info("Запуск процесса подбора пар 'Секретный кофе'...")
     
     # 1. Собираем всех активных сотрудников, которые участвуют в 'secret_coffee'
     # Пока выбираем всех активных сотрудников — фильтрацию по участию в сессии
     # можно сделать позже, используя ActivityParticipant/SecretCoffeePreference
-    active_employees = Employee.objects.filter(is_active=True)
+    active_employees = list(Employee.objects.filter(is_active=True))
 
     if not active_employees:
         logger.warning("Нет активных сотрудников для подбора. Процесс завершен.")
         return []
 
     # 2. Создаем клиент и вызываем сервис
-    client = MatchingServiceClient()
-    pairs_data = client.run_secret_coffee_matching(list(active_employees))
+    if shard_by is None:
+        shard_by = getattr(settings, 'MATCHING_SHARD_BY', '')
+    if shard_by:
+        pairs_data = async_to_sync(_run_sharded_matching)(active_employees, shard_by)
+    else:
+        client = MatchingServiceClient()
+        pairs_data = client.run_secret_coffee_matching(active_employees)
 
     if pairs_data is None:
         logger.error("Не удалось получить результат от сервиса подбора пар.")
@@ -307,6 +462,18 @@ def run_matching_for_active_employees() -> Optional[List[Tuple[int, int]]]:
     return result_pairs
 
 
+async def _run_sharded_matching(employees: List[Employee], shard_by: str) -> Optional[List[Dict[str, int]]]:
+    # импорт здесь: async_matching_client сам импортирует этот модуль
+    from bots.services.async_matching_client import get_default_async_client
+
+    client = get_default_async_client()
+    try:
+        return await client.run_sharded_matching(employees, shard_by)
+    finally:
+        # event loop async_to_sync живёт только на время вызова — закрываем его сессию
+        await client.close()
+
+
 # Module-level singleton helper. Use get_default_client() to obtain a shared
 # instance within the process so in-memory metrics are visible across callers.
 _DEFAULT_CLIENT = None
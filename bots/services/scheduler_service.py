@@ -80,6 +80,20 @@ class SchedulerService:
             replace_existing=True
         )
         
+        # 2a. Подбор пар для подписавшихся после matching - по будням каждый час с 11:30 до 18:30
+        self.scheduler.add_job(
+            self._run_coffee_incremental_matching_async,
+            trigger=CronTrigger(
+                day_of_week='mon-fri',
+                hour='11-18',
+                minute=30,
+                timezone='Europe/Moscow'
+            ),
+            id='coffee_incremental_matching',
+            name='Matching Тайного кофе для новых участников',
+            replace_existing=True
+        )
+        
         # 3. Отправка напоминаний - каждый день в 09:00
         self.scheduler.add_job(
             self._send_daily_reminders_async,
@@ -164,6 +178,16 @@ class SchedulerService:
         except Exception as e:
             logger.error(f"❌ Ошибка в matching Тайного кофе: {e}")
     
+    async def _run_coffee_incremental_matching_async(self):
+        """Подбор пар только для участников без пары (существующие встречи не меняются)"""
+        try:
+            logger.info("🔄 Запуск инкрементального matching Тайного кофе...")
+            if await anonymous_coffee_service.run_incremental_matching():
+                logger.info("✅ Инкрементальный matching Тайного кофе выполнен")
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка в инкрементальном matching Тайного кофе: {e}")
+    
     async def _send_daily_reminders_async(self):
         """Отправка ежедневных напоминаний"""
         try:
@@ -275,7 +299,7 @@ class SchedulerService:
             async for meeting in inactive_meetings:
                 # Переводим встречу в статус "не состоялась"
                 meeting.status = 'failed'
-                await meeting.asave()
+                await meeting.asave(update_fields=['status', 'updated_at'])
                 inactive_count += 1
                 
                 logger.info(f"⚠️ Встреча {meeting.meeting_id} переведена в статус 'не состоялась'")
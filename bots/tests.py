@@ -0,0 +1,270 @@
+import asyncio
+from datetime import date
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from bots.services import circuit_breaker
+from bots.services.async_matching_client import CROSS_SHARD, AsyncMatchingServiceClient, partition_participants
+from bots.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from bots.services.matching_service_client import MatchingServiceClient, get_shared_session
+from employees.models import CoffeePair, Department, Employee, SecretCoffee
+
+
+class PrepareRequestDataQueriesTest(TestCase):
+    """_prepare_request_data делает одинаковое число запросов при любом размере списка."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.departments = [Department.objects.create(name=f'Dept {i}', code=f'D{i}') for i in range(3)]
+        cls.employees = [
+            Employee.objects.create(full_name=f'Employee {i}', position='Senior Engineer' if i % 2 else 'Engineer',
+                                    department=cls.departments[i % 3])
+            for i in range(40)
+        ]
+        session = SecretCoffee.objects.create(week_start=date(2025, 1, 6))
+        for i in range(0, 40, 2):
+            CoffeePair.objects.create(secret_coffee=session, employee1=cls.employees[i], employee2=cls.employees[i + 1])
+
+    def _roster(self, size):
+        # свежие объекты без кэша связей, как их передаёт вызывающий код
+        return list(Employee.objects.filter(id__in=[e.id for e in self.employees[:size]]).order_by('id'))
+
+    def test_constant_query_count(self):
+        client = MatchingServiceClient()
+        for size in (2, 10, 40):
+            roster = self._roster(size)
+            with self.assertNumQueries(1):
+                data = client._prepare_request_data(roster)
+            self.assertEqual(len(data['employees']), size)
+
+    def test_partners_and_departments(self):
+        client = MatchingServiceClient()
+        data = client._prepare_request_data(self._roster(4))
+        by_id = {dto['id']: dto for dto in data['employees']}
+        first, second = self.employees[0], self.employees[1]
+        self.assertEqual(by_id[first.id]['excluded_partners'], [second.id])
+        self.assertEqual(by_id[second.id]['excluded_partners'], [first.id])
+        self.assertEqual(by_id[first.id]['department'], self.departments[0].id)
+        self.assertEqual(by_id[second.id]['position_level'], 'SENIOR')
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTest(SimpleTestCase):
+    """Переходы closed -> open -> half_open -> closed на подменённых часах."""
+
+    def setUp(self):
+        self.clock = _FakeClock()
+        patcher = mock.patch.object(circuit_breaker, 'monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker('test', failure_threshold=3, reset_timeout=30)
+
+    def _open(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+
+    def test_opens_at_failure_threshold(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_success_resets_failure_count(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_half_open_allows_single_probe(self):
+        self._open()
+        self.clock.now += 29.9
+        self.assertEqual(self.breaker.state, OPEN)
+        self.clock.now += 0.1
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertTrue(self.breaker.allow_request())
+        self.assertFalse(self.breaker.allow_request())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_failed_probe_reopens(self):
+        self._open()
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow_request())
+        # отсчёт reset_timeout начинается заново с неудачной пробы
+        self.clock.now += 29
+        self.assertEqual(self.breaker.state, OPEN)
+        self.clock.now += 1
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+
+
+class MatchingClientBreakerTest(SimpleTestCase):
+    """Пока breaker открыт, клиент не обращается к сервису подбора."""
+
+    def setUp(self):
+        self.session = mock.Mock()
+        self.client = MatchingServiceClient(session=self.session)
+        self.client.breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=30)
+        self.client.breaker.record_failure()
+        patcher = mock.patch.object(MatchingServiceClient, 'start_health_monitor')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_matching_short_circuits(self):
+        self.assertIsNone(self.client.run_secret_coffee_matching([]))
+        self.assertEqual(self.client.metrics['matching_failures'], 1)
+        self.session.request.assert_not_called()
+
+    def test_request_with_retry_skips_network(self):
+        self.assertIsNone(self.client._request_with_retry('post', 'http://matching/api', json={}))
+        self.session.request.assert_not_called()
+
+
+class SharedSessionTest(SimpleTestCase):
+    """Клиенты процесса используют одну пуловую HTTP-сессию, если своя не передана."""
+
+    def test_clients_share_session(self):
+        first, second = MatchingServiceClient(), MatchingServiceClient()
+        self.assertIs(first.session, second.session)
+        self.assertIs(first.session, get_shared_session())
+        own = mock.Mock()
+        self.assertIs(MatchingServiceClient(session=own).session, own)
+
+
+class _FakeResponse:
+    def __init__(self, status, body):
+        self.status = status
+        self._body = body
+
+    async def text(self):
+        return self._body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _FakeAsyncSession:
+    """Отдаёт заранее заданные ответы по очереди и считает запросы."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def request(self, method, url, json=None):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+class AsyncMatchingClientTest(SimpleTestCase):
+    """Асинхронный клиент: одна сессия на event loop и повтор ответов 5xx."""
+
+    def setUp(self):
+        self.client = AsyncMatchingServiceClient(sync_client=MatchingServiceClient(session=mock.Mock()))
+        self.client.breaker = CircuitBreaker('test', failure_threshold=5, reset_timeout=30)
+
+    def test_session_reused_within_loop(self):
+        async def sessions():
+            first, second = self.client._session(), self.client._session()
+            await self.client.close()
+            return first, second
+
+        first, second = asyncio.run(sessions())
+        self.assertIs(first, second)
+        other, _ = asyncio.run(sessions())
+        # у другого event loop — своя сессия
+        self.assertIsNot(other, first)
+
+    def test_retries_5xx_response(self):
+        session = _FakeAsyncSession(_FakeResponse(503, 'unavailable'), _FakeResponse(200, '{"pairs": []}'))
+        with mock.patch.object(self.client, '_session', return_value=session):
+            result = asyncio.run(self.client.request_json('post', '/api', {}, backoff_factor=0))
+        self.assertEqual(result, (200, {'pairs': []}))
+        self.assertEqual(session.calls, 2)
+        self.assertEqual(self.client.breaker.state, CLOSED)
+
+    def test_4xx_is_not_retried(self):
+        session = _FakeAsyncSession(_FakeResponse(400, '{"error": "bad"}'))
+        with mock.patch.object(self.client, '_session', return_value=session):
+            result = asyncio.run(self.client.request_json('post', '/api', {}, backoff_factor=0))
+        self.assertEqual(result, (400, {'error': 'bad'}))
+        self.assertEqual(session.calls, 1)
+
+    def test_last_5xx_is_returned(self):
+        session = _FakeAsyncSession(*(_FakeResponse(502, 'bad gateway') for _ in range(3)))
+        with mock.patch.object(self.client, '_session', return_value=session):
+            result = asyncio.run(self.client.request_json('post', '/api', {}, backoff_factor=0))
+        self.assertEqual(result, (502, 'bad gateway'))
+        self.assertEqual(session.calls, 3)
+        # каждая неудачная попытка засчитана breaker-у ровно один раз
+        self.assertEqual(self.client.breaker.snapshot()['consecutive_failures'], 3)
+
+
+class ShardedMatchingTest(SimpleTestCase):
+    """Шардирование сохраняет всех участников и не сводит в пару людей из разных шардов."""
+
+    def setUp(self):
+        # шард A — 3 человека, B — 2, C — 1, без бизнес-центра — 2
+        centers = [1, 1, 1, 2, 2, 3, None, None]
+        self.employees = [SimpleNamespace(id=i + 1, business_center_id=bc, department_id=None)
+                          for i, bc in enumerate(centers)]
+        self.client = AsyncMatchingServiceClient(sync_client=MatchingServiceClient(session=mock.Mock()))
+        self.calls = []
+
+        async def fake_matching(members, partners=None):
+            # соседние участники шарда становятся парой, нечётный остаётся без пары
+            self.calls.append([emp.id for emp in members])
+            return [{'employee1_id': a.id, 'employee2_id': b.id} for a, b in zip(members[::2], members[1::2])]
+
+        matching = mock.patch.object(self.client, 'run_secret_coffee_matching', side_effect=fake_matching)
+        matching.start()
+        self.addCleanup(matching.stop)
+        history = mock.patch.object(self.client._sync, '_load_partner_history', return_value={})
+        history.start()
+        self.addCleanup(history.stop)
+
+    def test_partition_keeps_every_participant(self):
+        shards = partition_participants(self.employees, 'business_center')
+        self.assertEqual(set(shards), {'1', '2', '3', 'none'})
+        ids = [emp.id for members in shards.values() for emp in members]
+        self.assertEqual(sorted(ids), [emp.id for emp in self.employees])
+        self.assertEqual([emp.id for emp in shards['none']], [7, 8])
+        with self.assertRaises(ValueError):
+            partition_participants(self.employees, 'floor')
+
+    def test_shard_pairs_stay_within_shard(self):
+        shard_of = {emp.id: emp.business_center_id for emp in self.employees}
+        pairs = asyncio.run(self.client.run_sharded_matching(self.employees, 'business_center'))
+
+        *shard_calls, cross_call = self.calls
+        # шард из одного человека в сервис не отправляется
+        self.assertEqual(sorted(shard_calls), [[1, 2, 3], [4, 5], [7, 8]])
+        # в общий проход попадают только оставшиеся без пары
+        self.assertEqual(sorted(cross_call), [3, 6])
+        cross = {frozenset(cross_call)}
+        for pair in pairs:
+            ids = frozenset((pair['employee1_id'], pair['employee2_id']))
+            if ids not in cross:
+                self.assertEqual(len({shard_of[i] for i in ids}), 1)
+        paired = [i for pair in pairs for i in (pair['employee1_id'], pair['employee2_id'])]
+        self.assertEqual(sorted(paired), [emp.id for emp in self.employees])
+        self.assertIn(CROSS_SHARD, self.client.metrics['last_sharded_run']['shards'])
@@ -0,0 +1,13 @@
+"""ASGI entrypoint for ConnectBot project.
+
+This file provides the ASGI application object used by ASGI servers
+like Uvicorn (e.g. Gunicorn with uvicorn.workers.UvicornWorker), which
+serve the async Data API views natively.
+"""
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+application = get_asgi_application()
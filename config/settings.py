@@ -97,6 +97,20 @@ REDIS_URL = config('REDIS_URL', default='redis://redis:6379/0')
 # Java Service Configuration
 MATCHING_SERVICE_URL = config('MATCHING_SERVICE_URL_INTERNAL', default='http://localhost:8080')
 MATCHING_SERVICE_TIMEOUT = config('MATCHING_SERVICE_TIMEOUT', default=15, cast=int)
+# Пул HTTP-соединений к Java-сервису (keep-alive, общий на процесс)
+MATCHING_SERVICE_POOL_CONNECTIONS = config('MATCHING_SERVICE_POOL_CONNECTIONS', default=4, cast=int)  # число хостов в пуле
+MATCHING_SERVICE_POOL_MAXSIZE = config('MATCHING_SERVICE_POOL_MAXSIZE', default=10, cast=int)  # соединений на хост
+MATCHING_SERVICE_POOL_BLOCK = config('MATCHING_SERVICE_POOL_BLOCK', default=False, cast=bool)  # ждать свободное соединение
+# Circuit breaker и фоновая проверка здоровья Java-сервиса
+MATCHING_SERVICE_BREAKER_FAILURES = config('MATCHING_SERVICE_BREAKER_FAILURES', default=5, cast=int)  # ошибок подряд до open
+MATCHING_SERVICE_BREAKER_RESET_SECONDS = config('MATCHING_SERVICE_BREAKER_RESET_SECONDS', default=30, cast=float)  # open -> half_open
+MATCHING_SERVICE_HEALTH_INTERVAL = config('MATCHING_SERVICE_HEALTH_INTERVAL', default=15, cast=float)  # период health-check, сек
+# Подбор по шардам: '' (выключен), 'business_center' или 'department'
+MATCHING_SHARD_BY = config('MATCHING_SHARD_BY', default='')
+MATCHING_SHARD_CONCURRENCY = config('MATCHING_SHARD_CONCURRENCY', default=8, cast=int)  # параллельных запросов по шардам
+# Локальный движок подбора (fallback при недоступности Java-сервиса)
+MATCHING_ENGINE_WORKERS = config('MATCHING_ENGINE_WORKERS', default=1, cast=int)  # процессов в пуле
+MATCHING_NEWCOMER_DAYS = config('MATCHING_NEWCOMER_DAYS', default=90, cast=int)  # новичок — принят не раньше, дней
 
 
 # Secret token for /metrics/trigger endpoint (empty by default — disabled in prod)
@@ -283,6 +297,7 @@ CACHE_TTL = {
     'user_profile': 3600,  # 1 hour
     'activities': 900,  # 15 minutes
     'temporary_data': 1800,  # 30 minutes
+    'matching_result': 604800,  # 7 days: верхняя граница, запись живёт до конца недели подбора
 }
 
 # Internationalization
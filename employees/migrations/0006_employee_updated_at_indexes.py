@@ -0,0 +1,21 @@
+# Generated by Django 5.0.6 on 2026-10-16 20:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0005_alter_adminuser_options_alter_adminlog_action_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['updated_at'], name='employees_e_updated_b98293_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employeeinterest',
+            index=models.Index(fields=['updated_at'], name='employees_e_updated_28b461_idx'),
+        ),
+    ]
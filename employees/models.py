@@ -93,6 +93,7 @@ class Employee(models.Model):
             models.Index(fields=['telegram_username']),
             models.Index(fields=['normalized_username']),
             models.Index(fields=['is_active', 'authorized']),
+            models.Index(fields=['updated_at']),  # delta sync для Data API
         ]
     
     def __str__(self):
@@ -310,6 +311,7 @@ class EmployeeInterest(models.Model):
         indexes = [
             models.Index(fields=['employee', 'is_active']),
             models.Index(fields=['interest', 'is_active']),
+            models.Index(fields=['updated_at']),  # delta sync для Data API
         ]
     
     def __str__(self):
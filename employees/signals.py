@@ -4,7 +4,7 @@ import logging
 
 from python_app.services import cache_utils
 
-from .models import Employee, EmployeeInterest, Interest
+from .models import Employee, EmployeeInterest, Interest, Department, BusinessCenter, CoffeePair
 
 logger = logging.getLogger(__name__)
 
@@ -14,8 +14,8 @@ def _employee_saved(sender, instance: Employee, **kwargs):
     """Invalidate Data API caches related to employees when employee is changed."""
     try:
         # Employee.save() already invalidates per-employee Redis keys; here invalidate Data API aggregated caches
-        deleted = cache_utils.invalidate_data_api_prefixes(['employees_for_matching', 'employee_interests'])
-        logger.info('Signals: invalidated %d Data API keys for Employee %s', deleted, getattr(instance, 'id', None))
+        cache_utils.invalidate_data_api_domains(['employees'])
+        logger.info('Signals: invalidated Data API employees generation for Employee %s', getattr(instance, 'id', None))
     except Exception:
         logger.exception('Error invalidating Data API cache on employee save')
 
@@ -23,8 +23,10 @@ def _employee_saved(sender, instance: Employee, **kwargs):
 @receiver(post_delete, sender=Employee)
 def _employee_deleted(sender, instance: Employee, **kwargs):
     try:
-        deleted = cache_utils.invalidate_data_api_prefixes(['employees_for_matching', 'employee_interests'])
-        logger.info('Signals: invalidated %d Data API keys for deleted Employee %s', deleted, getattr(instance, 'id', None))
+        # hard deletes leave no row behind; remember them for the delta endpoint
+        cache_utils.record_data_api_tombstone('employees', instance.id)
+        cache_utils.invalidate_data_api_domains(['employees'])
+        logger.info('Signals: invalidated Data API employees generation for deleted Employee %s', getattr(instance, 'id', None))
     except Exception:
         logger.exception('Error invalidating Data API cache on employee delete')
 
@@ -33,9 +35,12 @@ def _employee_deleted(sender, instance: Employee, **kwargs):
 @receiver(post_delete, sender=EmployeeInterest)
 def _employee_interest_changed(sender, instance: EmployeeInterest, **kwargs):
     try:
+        if kwargs.get('signal') is post_delete:
+            # a deleted link has no updated_at to pick up; mark the employee's interests as changed
+            cache_utils.record_data_api_tombstone('employee_interests', instance.employee_id)
         # when interests change, invalidate employee_interests and employees_for_matching caches
-        deleted = cache_utils.invalidate_data_api_prefixes(['employee_interests', 'employees_for_matching'])
-        logger.info('Signals: invalidated %d Data API keys for EmployeeInterest change (employee=%s)', deleted, getattr(instance.employee, 'id', None))
+        cache_utils.invalidate_data_api_domains(['interests'])
+        logger.info('Signals: invalidated Data API interests generation for EmployeeInterest change (employee=%s)', instance.employee_id)
     except Exception:
         logger.exception('Error invalidating Data API cache on employee interest change')
 
@@ -44,7 +49,40 @@ def _employee_interest_changed(sender, instance: EmployeeInterest, **kwargs):
 @receiver(post_delete, sender=Interest)
 def _interest_changed(sender, instance: Interest, **kwargs):
     try:
-        deleted = cache_utils.invalidate_all_data_api()
-        logger.info('Signals: invalidated %d Data API keys for Interest change id=%s', deleted, getattr(instance, 'id', None))
+        # catalog changes touch every employee's interests; delta clients must resync
+        cache_utils.record_data_api_tombstone('interest_catalog', instance.id)
+        cache_utils.invalidate_data_api_domains(['interests'])
+        logger.info('Signals: invalidated Data API interests generation for Interest change id=%s', getattr(instance, 'id', None))
     except Exception:
         logger.exception('Error invalidating Data API cache on interest change')
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+@receiver(post_save, sender=BusinessCenter)
+@receiver(post_delete, sender=BusinessCenter)
+def _employee_directory_changed(sender, instance, **kwargs):
+    """Departments and business centers are embedded in serialized employees."""
+    try:
+        # a rename changes every member's serialized form without touching Employee.updated_at;
+        # delta clients must resync
+        cache_utils.record_data_api_tombstone('directory', f'{sender.__name__}:{instance.id}')
+        cache_utils.invalidate_data_api_domains(['employees'])
+        logger.info('Signals: invalidated Data API employees generation for %s change id=%s', sender.__name__, getattr(instance, 'id', None))
+    except Exception:
+        logger.exception('Error invalidating Data API cache on %s change', sender.__name__)
+
+
+@receiver(post_save, sender=CoffeePair)
+@receiver(post_delete, sender=CoffeePair)
+def _coffee_pair_changed(sender, instance: CoffeePair, **kwargs):
+    """Pair history feeds excluded_partners: move cached matching results to a new generation."""
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not {'employee1', 'employee2'} & set(update_fields):
+        # status/feedback updates do not change who was paired with whom
+        return
+    try:
+        cache_utils.invalidate_data_api_domains([cache_utils.MATCHING_HISTORY_DOMAIN])
+        logger.info('Signals: invalidated matching history generation for CoffeePair %s', getattr(instance, 'id', None))
+    except Exception:
+        logger.exception('Error invalidating matching history generation on coffee pair change')
@@ -0,0 +1,194 @@
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from employees.models import Department, Employee
+from python_app.api import data_api
+from python_app.services import service_tokens
+from python_app.services.data_api_service import DataAPIService
+
+
+class _Tombstones:
+    """Хранилище tombstone в памяти вместо Redis; available=False — Redis недоступен."""
+
+    def __init__(self):
+        self.entries = {}
+        self.available = True
+
+    def record(self, domain, object_id):
+        self.entries.setdefault(domain, {})[str(object_id)] = time.time()
+        return True
+
+    def get(self, domain, since_ts):
+        if not self.available:
+            return None
+        return [object_id for object_id, ts in self.entries.get(domain, {}).items() if ts > since_ts]
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class EmployeesDeltaTest(TestCase):
+    """POST employees_delta: курсор, удалённые сотрудники и полная пересинхронизация."""
+
+    def setUp(self):
+        self.tombstones = _Tombstones()
+        for name, fake in (('record_data_api_tombstone', self.tombstones.record),
+                           ('get_data_api_tombstones', self.tombstones.get)):
+            patcher = mock.patch(f'python_app.services.cache_utils.{name}', side_effect=fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        auth = mock.patch.object(data_api, '_auth_ok', return_value=True)
+        auth.start()
+        self.addCleanup(auth.stop)
+
+        self.department = Department.objects.create(name='Dept', code='D')
+        self.employees = [Employee.objects.create(full_name=f'Employee {i}', department=self.department)
+                          for i in range(3)]
+        # строки старше первого курсора
+        Employee.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+
+    def _delta(self, cursor=None):
+        body = {'cursor': cursor} if cursor else {}
+        request = RequestFactory().post('/data/employees/delta', json.dumps(body), content_type='application/json')
+        response = async_to_sync(data_api.employees_delta)(request)
+        return response.status_code, json.loads(response.content)
+
+    def test_cursor_round_trip(self):
+        status, first = self._delta()
+        self.assertEqual(status, 200)
+        self.assertTrue(first['full_resync'])
+        self.assertEqual(len(first['employees']), 3)
+
+        changed = self.employees[1]
+        changed.full_name = 'Renamed'
+        changed.save()
+        status, second = self._delta(first['cursor'])
+        self.assertEqual(status, 200)
+        self.assertFalse(second['full_resync'])
+        self.assertEqual([e['id'] for e in second['employees']], [str(changed.id)])
+        self.assertEqual(second['deactivated'], [])
+        self.assertTrue(second['cursor'])
+
+    def test_deleted_employee_is_tombstoned(self):
+        _, first = self._delta()
+        deleted_id = self.employees[0].id
+        self.employees[0].delete()
+        _, second = self._delta(first['cursor'])
+        self.assertFalse(second['full_resync'])
+        self.assertEqual(second['deactivated'], [str(deleted_id)])
+
+    def test_full_resync_without_tombstones(self):
+        _, first = self._delta()
+        self.tombstones.available = False
+        _, second = self._delta(first['cursor'])
+        self.assertTrue(second['full_resync'])
+        self.assertEqual(len(second['employees']), 3)
+
+    def test_directory_rename_forces_full_resync(self):
+        _, first = self._delta()
+        self.department.name = 'Renamed dept'
+        self.department.save()
+        _, second = self._delta(first['cursor'])
+        self.assertTrue(second['full_resync'])
+
+    def test_invalid_cursor_is_rejected(self):
+        status, data = self._delta('not-a-cursor')
+        self.assertEqual(status, 400)
+        self.assertEqual(data['error'], 'invalid_cursor')
+
+
+class PreviousMatchesParamsTest(TestCase):
+    """Параметры previous_matches: некорректный page_size и окно since_date в ключе кэша."""
+
+    def test_malformed_page_size_uses_default(self):
+        for page_size in ('abc', None, ['1']):
+            data = DataAPIService().get_previous_matches({'page_size': page_size})
+            self.assertEqual(data, {'matches': [], 'count': 0, 'next_cursor': None})
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_next_day_changes_etag(self):
+        def request(now, etag=None):
+            headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+            req = RequestFactory().post('/data/previous_matches', json.dumps({'since_days': 7}),
+                                        content_type='application/json', **headers)
+            with mock.patch('python_app.services.data_api_service.datetime') as fake:
+                fake.utcnow.return_value = now
+                return async_to_sync(data_api.previous_matches)(req)
+
+        with mock.patch.object(data_api, '_auth_ok', return_value=True):
+            first = request(datetime(2026, 3, 2, 23, 59))
+            self.assertEqual(request(datetime(2026, 3, 2, 23, 59, 30), first['ETag']).status_code, 304)
+            # окно сдвинулось на день: прежний ETag не подходит
+            second = request(datetime(2026, 3, 3, 0, 1), first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class EmployeesNdjsonStreamTest(TestCase):
+    """NDJSON-поток под WSGI отдаётся синхронным итератором, а не вычитывается целиком."""
+
+    def test_wsgi_request_streams_sync_iterator(self):
+        employees = [Employee.objects.create(full_name=f'Employee {i}') for i in range(3)]
+        request = RequestFactory().post('/data/employees_for_matching', '{}', content_type='application/json',
+                                        HTTP_ACCEPT=data_api.NDJSON_CONTENT_TYPE)
+        with mock.patch.dict('os.environ', {'DATA_API_ROSTER_SNAPSHOT': '0'}), \
+                mock.patch.object(data_api, '_auth_ok', return_value=True):
+            response = async_to_sync(data_api.employees_for_matching)(request)
+            self.assertFalse(response.is_async)
+            rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(sorted(row['id'] for row in rows), sorted(str(e.id) for e in employees))
+
+
+class ServiceTokenRotationTest(SimpleTestCase):
+    """Токен из файла перечитывается по mtime; после ротации старый токен не принимается."""
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp()
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        env = mock.patch.dict('os.environ', {'SERVICE_AUTH_TOKEN': '', 'SERVICE_AUTH_TOKEN_FILE': self.path,
+                                             'SERVICE_AUTH_TOKEN_RELOAD_SECONDS': '0'})
+        env.start()
+        self.addCleanup(env.stop)
+        service_tokens.reset_token_provider()
+        self.addCleanup(service_tokens.reset_token_provider)
+        self.mtime = time.time_ns()
+
+    def _write(self, content):
+        with open(self.path, 'w', encoding='utf-8') as fh:
+            fh.write(content)
+        # mtime сдвигается явно: запись в ту же наносекунду не должна маскировать ротацию
+        self.mtime += 1_000_000_000
+        os.utime(self.path, ns=(self.mtime, self.mtime))
+
+    def _authorized(self, token):
+        request = RequestFactory().post('/data/employees_for_matching', HTTP_AUTHORIZATION=f'Service {token}')
+        return data_api._auth_ok(request)
+
+    def test_reload_on_mtime_change(self):
+        self._write('old-token\n')
+        self.assertTrue(self._authorized('old-token'))
+        self._write('old-token\nnew-token\n')
+        self.assertTrue(self._authorized('new-token'))
+        self.assertTrue(self._authorized('old-token'))
+
+    def test_old_token_rejected_after_rotation(self):
+        self._write('old-token')
+        self.assertTrue(self._authorized('old-token'))
+        self._write('new-token')
+        self.assertFalse(self._authorized('old-token'))
+        self.assertTrue(self._authorized('new-token'))
+
+    def test_unchanged_mtime_is_not_reread(self):
+        provider = service_tokens.DefaultTokenProvider()
+        self._write('old-token')
+        self.assertTrue(provider.is_valid('old-token'))
+        with mock.patch('builtins.open', side_effect=AssertionError('file re-read')):
+            self.assertTrue(provider.is_valid('old-token'))
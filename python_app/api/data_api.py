@@ -1,22 +1,40 @@
 import os
+import gzip
 import json
+import time
 import hashlib
 import logging
-import secrets as _secrets
+import threading
 from time import perf_counter
-from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.db import connection
 
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, HttpResponseNotModified
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.http import parse_etags, quote_etag
 from django.views.decorators.http import require_POST, require_GET
 from django.views.decorators.csrf import csrf_exempt
-from django.core.cache import cache
 
-from python_app.services.data_api_service import DataAPIService
-from python_app.serializers.data_serializers import sanitize_request_for_logging
-from python_app.services.cache_utils import register_data_api_key
+from python_app.services.service_tokens import get_token_provider
+from python_app.services.data_api_service import DataAPIService, InvalidCursor, BUNDLE_SECTIONS, previous_matches_since
+from python_app.serializers.data_serializers import (
+    sanitize_request_for_logging, normalize_employee_fields, EMPLOYEE_FIELDS,
+)
+from python_app.services.cache_utils import (
+    data_api_generation, DATA_API_DOMAINS, DATA_API_ENDPOINT_DOMAINS, set_data_api_entry,
+    acquire_data_api_lease, release_data_api_lease,
+    aget_data_api_versions, aget_data_api_entry,
+    aacquire_data_api_lease, arelease_data_api_lease, await_data_api_entries,
+)
 
 logger = logging.getLogger(__name__)
 
+try:
+    import zstandard
+except Exception:  # pragma: no cover - optional runtime
+    zstandard = None
+
 try:
     from prometheus_client import Counter, Histogram
     _HAS_PROM = True
@@ -29,23 +47,17 @@ if _HAS_PROM:
     REQ_LATENCY = Histogram('data_api_request_latency_seconds', 'Request latency', ['endpoint'])
     CACHE_HITS = Counter('data_api_cache_hits_total', 'Cache hits for Data API', ['endpoint'])
     CACHE_MISSES = Counter('data_api_cache_misses_total', 'Cache misses for Data API', ['endpoint'])
+    NOT_MODIFIED = Counter('data_api_not_modified_total', 'Conditional Data API requests answered with 304', ['endpoint'])
+    COALESCED = Counter('data_api_coalesced_requests_total', 'Cache misses served from another worker\'s rebuild', ['endpoint'])
+    COALESCE_FALLBACKS = Counter('data_api_coalesce_fallbacks_total', 'Waiters that rebuilt themselves after the lease expired', ['endpoint'])
+    STALE_SERVED = Counter('data_api_stale_served_total', 'Cache hits served past their soft TTL', ['endpoint'])
+    REVALIDATIONS = Counter('data_api_revalidations_total', 'Background rebuilds of stale Data API entries', ['endpoint', 'result'])
 else:
     REQ_COUNTER = REQ_ERRORS = REQ_LATENCY = None
     CACHE_HITS = CACHE_MISSES = None
-
-
-def _read_service_token_from_file():
-    # Docker secrets are often mounted at /run/secrets/<name>
-    token_file = os.getenv('SERVICE_AUTH_TOKEN_FILE', '/run/secrets/service_auth_token')
-    try:
-        if os.path.exists(token_file):
-            with open(token_file, 'r', encoding='utf-8') as fh:
-                data = fh.read()
-                # strip BOM and whitespace/newlines
-                return data.replace('\ufeff', '').strip()
-    except Exception:
-        logger.debug('Failed to read service token from file %s', token_file)
-    return ''
+    NOT_MODIFIED = None
+    COALESCED = COALESCE_FALLBACKS = None
+    STALE_SERVED = REVALIDATIONS = None
 
 
 def _auth_ok(request):
@@ -59,44 +71,90 @@ def _auth_ok(request):
     if scheme.lower() != 'service':
         return False
 
-    # Prefer explicit environment variable (tests/CI may patch os.environ).
-    # Fallback to Django settings.SERVICE_AUTH_TOKEN, then token file.
-    expected = os.getenv('SERVICE_AUTH_TOKEN', '') or getattr(settings, 'SERVICE_AUTH_TOKEN', None) or _read_service_token_from_file()
-
-    if not expected:
-        # no configured token -> fail closed
-        logger.warning('No service auth token configured for Data API')
-        return False
-
-    # Normalize token (strip BOM/newlines/spaces)
-    token_norm = token.replace('\ufeff', '').strip()
-    expected_norm = expected.replace('\ufeff', '').strip()
-
-    # Masked logging for debugging: show first 8 chars and length only
+    # tokens are resolved and cached by the provider; this is an in-memory check
+    provider = get_token_provider()
     try:
-        def _mask(s: str):
-            if not s:
-                return '<empty>'
-            return s[:8] + '...' if len(s) > 8 else s
-
-        if not _secrets.compare_digest(token_norm, expected_norm):
-            logger.warning('Unauthorized request; Authorization header present repr=%r, token_mask=%s, token_len=%d, expected_mask=%s, expected_len=%d',
-                           header, _mask(token_norm), len(token_norm), _mask(expected_norm), len(expected_norm))
-            return False
+        if provider.is_valid(token):
+            return True
+        if not provider.tokens():
+            # no configured token -> fail closed
+            logger.warning('No service auth token configured for Data API')
+        else:
+            logger.warning('Unauthorized Data API request; token_len=%d', len(token.strip()))
     except Exception:
         logger.exception('Error during auth token comparison')
-        return False
+    return False
 
-    return True
 
-
-def _cache_key_for_request(prefix: str, body: dict) -> str:
+def _cache_key_for_request(prefix: str, body: dict, versions: dict) -> str:
+    """data_api:{prefix}:{generation}:{sha256}; the generation changes on every invalidation."""
     m = hashlib.sha256()
     m.update(prefix.encode('utf-8'))
     if body is not None:
         payload = json.dumps(body, sort_keys=True, default=str)
         m.update(payload.encode('utf-8'))
-    return f"data_api:{prefix}:{m.hexdigest()}"
+    return f"data_api:{prefix}:{data_api_generation(prefix, versions)}:{m.hexdigest()}"
+
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+
+def _wants_ndjson(request) -> bool:
+    accept = request.headers.get('Accept') or request.META.get('HTTP_ACCEPT', '')
+    return NDJSON_CONTENT_TYPE in accept.lower()
+
+
+def _stream_employees_ndjson(request, endpoint: str, body: dict):
+    """Stream employees as NDJSON: one serialized employee per line.
+
+    The streaming path bypasses the Data API cache on purpose: caching would
+    require materializing the whole roster, which is what streaming avoids.
+    Under ASGI rows come from an async iterator, so each chunk is written as it
+    is read. Under WSGI Django would read an async iterator into memory in full,
+    so the body is a sync iterator over the same chunked query instead.
+    """
+    chunk_size = int(os.getenv('DATA_API_STREAM_CHUNK_SIZE', 500))
+    svc = DataAPIService()
+    start = perf_counter()
+    count = 0
+
+    def _line(emp) -> bytes:
+        nonlocal count
+        count += 1
+        return json.dumps(emp).encode('utf-8') + b'\n'
+
+    def _failed(e):
+        # headers are already sent; the client detects the truncated stream
+        logger.exception('%s stream failed after %d rows: %s', endpoint, count, e)
+        if REQ_ERRORS:
+            REQ_ERRORS.labels(endpoint=endpoint).inc()
+
+    def _done():
+        elapsed = perf_counter() - start
+        if REQ_LATENCY:
+            REQ_LATENCY.labels(endpoint=endpoint).observe(elapsed)
+        logger.info(f'{endpoint} streamed in {elapsed:.3f}s, count={count}')
+
+    async def _alines():
+        try:
+            async for emp in svc.aiter_employees_for_matching(body, chunk_size=chunk_size):
+                yield _line(emp)
+        except Exception as e:
+            _failed(e)
+            raise
+        _done()
+
+    def _lines():
+        try:
+            for emp in svc.iter_employees_for_matching(body, chunk_size=chunk_size):
+                yield _line(emp)
+        except Exception as e:
+            _failed(e)
+            raise
+        _done()
+
+    lines = _alines() if isinstance(request, ASGIRequest) else _lines()
+    return StreamingHttpResponse(lines, content_type=NDJSON_CONTENT_TYPE)
 
 
 class _NoopContext:
@@ -106,9 +164,359 @@ class _NoopContext:
         return False
 
 
+# endpoint -> (env var, default seconds) for its cache TTL
+_ENDPOINT_TTLS = {
+    'employees_for_matching': ('DATA_API_TTL_EMPLOYEES', 300),
+    'previous_matches': ('DATA_API_TTL_PREV_MATCHES', 900),
+    'employee_interests': ('DATA_API_TTL_INTERESTS', 600),
+}
+
+# matching bundle section -> endpoint whose cache prefix (and so invalidation) it shares
+BUNDLE_SECTION_PREFIXES = {
+    'employees': 'employees_for_matching',
+    'interests': 'employee_interests',
+    'previous_matches': 'previous_matches',
+}
+
+
+def _ttl_for(endpoint: str) -> int:
+    env_name, default = _ENDPOINT_TTLS[endpoint]
+    return int(os.getenv(env_name, default))
+
+
+def _parse_body(request) -> dict:
+    try:
+        return json.loads(request.body.decode('utf-8') or '{}')
+    except Exception:
+        return {}
+
+
+def _normalize_fields(endpoint: str, body: dict):
+    """Canonicalize body['fields'] in place so equivalent projections share a cache key.
+
+    Returns a 400 response for an invalid projection, else None.
+    """
+    if 'fields' not in body:
+        return None
+    try:
+        fields = normalize_employee_fields(body['fields'])
+    except ValueError as e:
+        logger.warning('%s rejected fields: %s', endpoint, e)
+        if REQ_ERRORS:
+            REQ_ERRORS.labels(endpoint=endpoint).inc()
+        return JsonResponse({'error': 'invalid_fields', 'allowed': ['id', *EMPLOYEE_FIELDS]}, status=400)
+    if fields is None:
+        del body['fields']
+    else:
+        body['fields'] = list(fields)
+    return None
+
+
+def _etag_for(cache_key: str, variant: str = ''):
+    """Strong ETag for a generation-tagged cache key.
+
+    The key already carries the content versions of the endpoint's domains, so
+    the ETag changes exactly when the cached entry is invalidated.
+    """
+    m = hashlib.sha256(cache_key.encode('utf-8'))
+    m.update(variant.encode('utf-8'))
+    return quote_etag(m.hexdigest()[:32])
+
+
+def _not_modified(request, endpoint: str, *etags, vary=None):
+    """Return a 304 response if If-None-Match matches one of etags, else None.
+
+    Several etags are the per-coding ETags of one resource; the 304 carries the
+    matched one, and vary is echoed so caches key it like the 200.
+    """
+    header = request.headers.get('If-None-Match')
+    etags = [etag for etag in etags if etag]
+    if not etags or not header:
+        return None
+    candidates = parse_etags(header)
+    # weak comparison per RFC 9110 for If-None-Match
+    candidates = {c[2:] if c.startswith('W/') else c for c in candidates}
+    matched = etags[0] if '*' in candidates else next((etag for etag in etags if etag in candidates), None)
+    if matched is not None:
+        if NOT_MODIFIED:
+            NOT_MODIFIED.labels(endpoint=endpoint).inc()
+        response = HttpResponseNotModified()
+        response['ETag'] = matched
+        if vary:
+            response['Vary'] = vary
+        return response
+    return None
+
+
+def _with_etag(response, etag):
+    if etag:
+        response['ETag'] = etag
+    return response
+
+
+# content codings we can store next to a cache entry, in server preference order
+CONTENT_CODINGS = ('zstd', 'gzip')
+
+
+def _accepted_encodings(request) -> list:
+    """Codings from CONTENT_CODINGS the client accepts, best first.
+
+    Parses Accept-Encoding q-values: q=0 refuses a coding, '*' covers codings
+    not listed explicitly. Ties keep the server preference order.
+    """
+    header = request.headers.get('Accept-Encoding') or ''
+    qvalues = {}
+    for part in header.lower().split(','):
+        coding, _, params = part.strip().partition(';')
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qvalues[coding.strip()] = q
+    accepted = []
+    for pos, coding in enumerate(CONTENT_CODINGS):
+        q = qvalues.get(coding, qvalues.get('*', 0.0))
+        if q > 0:
+            accepted.append((-q, pos, coding))
+    return [coding for _q, _pos, coding in sorted(accepted)]
+
+
+def _encode_body(data) -> bytes:
+    # same encoder JsonResponse uses, so cached bytes match the uncached response
+    return json.dumps(data, cls=DjangoJSONEncoder).encode('utf-8')
+
+
+def _compress_min_bytes() -> int:
+    return int(os.getenv('DATA_API_COMPRESS_MIN_BYTES', 1024))
+
+
+def _encoded_variants(body: bytes) -> dict:
+    """The identity body plus compressed copies, computed once per cache fill.
+
+    gzip always (unless DATA_API_CACHE_GZIP=0); zstd when the zstandard package
+    is installed (unless DATA_API_CACHE_ZSTD=0). Bodies below the threshold are
+    sent uncompressed.
+    """
+    variants = {'body': body}
+    if len(body) < _compress_min_bytes():
+        return variants
+    if os.getenv('DATA_API_CACHE_GZIP', '1') == '1':
+        variants['gzip'] = gzip.compress(body, compresslevel=int(os.getenv('DATA_API_GZIP_LEVEL', 6)))
+    if zstandard is not None and os.getenv('DATA_API_CACHE_ZSTD', '1') == '1':
+        variants['zstd'] = zstandard.ZstdCompressor(level=int(os.getenv('DATA_API_ZSTD_LEVEL', 3))).compress(body)
+    return variants
+
+
+def _bytes_response(variants: dict, encodings, cache_key):
+    """Write pre-encoded JSON bytes straight to the response.
+
+    Uses the first of encodings (from _accepted_encodings) with a stored variant,
+    else the identity body. The ETag is derived from cache_key and the coding
+    sent, so each representation has its own strong validator (RFC 9110 8.8.3);
+    no ETag without a cache_key.
+    """
+    for coding in encodings:
+        if variants.get(coding):
+            response = HttpResponse(variants[coding], content_type='application/json')
+            response['Content-Encoding'] = coding
+            break
+    else:
+        coding = ''
+        response = HttpResponse(variants['body'], content_type='application/json')
+    response['Vary'] = 'Accept-Encoding'
+    return _with_etag(response, _etag_for(cache_key, variant=coding) if cache_key else None)
+
+
+def _coding_etags(cache_key: str, encodings) -> list:
+    """ETags the client may hold for cache_key: one per accepted coding plus identity."""
+    return [_etag_for(cache_key, variant=coding) for coding in encodings] + [_etag_for(cache_key)]
+
+
+def _stale_seconds() -> int:
+    """Grace period after the soft TTL during which stale entries are still served."""
+    return int(os.getenv('DATA_API_STALE_SECONDS', 300))
+
+
+def _store_payload(cache_key: str, data, ttl: int) -> dict:
+    """Encode data, store it under cache_key and return the stored variants.
+
+    ttl is the soft TTL (freshness); the entry itself lives ttl + DATA_API_STALE_SECONDS
+    (hard TTL), and in between it is served stale while being revalidated.
+    """
+    variants = _encoded_variants(_encode_body(data))
+    variants['soft'] = repr(time.time() + ttl).encode('ascii')
+    hard_ttl = ttl + _stale_seconds()
+    set_data_api_entry(cache_key, variants, hard_ttl)
+    return variants
+
+
+def _is_stale(entry: dict) -> bool:
+    soft = entry.get('soft')
+    if soft is None:
+        return False
+    try:
+        return time.time() >= float(soft)
+    except (TypeError, ValueError):
+        return True
+
+
+# keys refreshing in this process; the redis lease dedupes across processes
+_REVALIDATING = set()
+_REVALIDATING_LOCK = threading.Lock()
+
+
+def _revalidate_async(endpoint: str, lease_key: str, refresh) -> None:
+    """Run refresh() in a background thread unless a revalidation of lease_key is already running.
+
+    Never blocks the caller: the cross-worker lease is taken inside the thread,
+    so the async views can call this straight from the event loop.
+    """
+    with _REVALIDATING_LOCK:
+        if lease_key in _REVALIDATING:
+            return
+        _REVALIDATING.add(lease_key)
+
+    def _run():
+        token = acquire_data_api_lease(lease_key, float(os.getenv('DATA_API_LEASE_SECONDS', 30)))
+        if token is None:
+            # another worker is already rebuilding it
+            with _REVALIDATING_LOCK:
+                _REVALIDATING.discard(lease_key)
+            return
+        result = 'ok'
+        try:
+            refresh()
+        except Exception:
+            result = 'error'
+            logger.exception('%s: background revalidation of %s failed', endpoint, lease_key)
+        finally:
+            release_data_api_lease(lease_key, token)
+            with _REVALIDATING_LOCK:
+                _REVALIDATING.discard(lease_key)
+            # the thread got its own DB connection; don't leak it
+            connection.close()
+            if REVALIDATIONS:
+                REVALIDATIONS.labels(endpoint=endpoint, result=result).inc()
+
+    threading.Thread(target=_run, name=f'data-api-revalidate-{endpoint}', daemon=True).start()
+
+
+async def _single_flight(endpoint: str, lease_key: str, entry_keys, fields):
+    """Coalesce concurrent rebuilds of the same entries across workers.
+
+    Returns (token, entries):
+      - (token, None): this request holds the lease; build, store, then release it
+      - (None, entries): another worker built the entries while we waited
+      - (None, None): the lease expired/was dropped without a result; build anyway
+    """
+    if os.getenv('DATA_API_SINGLE_FLIGHT', '1') != '1':
+        return None, None
+    lease_seconds = float(os.getenv('DATA_API_LEASE_SECONDS', 30))
+    token = await aacquire_data_api_lease(lease_key, lease_seconds)
+    if token is not None:
+        return token, None
+    entries = await await_data_api_entries(lease_key, list(entry_keys), fields, lease_seconds,
+                                           poll_interval=int(os.getenv('DATA_API_LEASE_POLL_MS', 50)) / 1000.0)
+    if entries is not None:
+        if COALESCED:
+            COALESCED.labels(endpoint=endpoint).inc()
+        return None, entries
+    if COALESCE_FALLBACKS:
+        COALESCE_FALLBACKS.labels(endpoint=endpoint).inc()
+    logger.warning('%s: lease on %s ended without a result; rebuilding locally', endpoint, lease_key)
+    return None, None
+
+
+async def _cached_response(request, endpoint: str, body: dict, ttl: int, build, describe):
+    """Serve endpoint from the Data API cache, computing and caching on a miss.
+
+    build() returns the payload dict; describe(payload) returns a short summary for logs.
+    Honors If-None-Match against the content-version ETag before touching the cache.
+    The cache holds the final encoded body (plus a gzip copy for large bodies), so a
+    hit is one HMGET and a write of those bytes: nothing is decoded or re-encoded.
+    Hits are served on the event loop; only a miss hands build() to a worker thread.
+    """
+    encodings = _accepted_encodings(request)
+    versions = await aget_data_api_versions(DATA_API_ENDPOINT_DOMAINS[endpoint])
+    if versions is None:
+        # generation unknown: anything read or written now could outlive an invalidation
+        return await _build_response(endpoint, build, describe, lambda data: _encoded_variants(_encode_body(data)),
+                                     encodings, None)
+
+    cache_key = _cache_key_for_request(endpoint, body, versions)
+    not_modified = _not_modified(request, endpoint, *_coding_etags(cache_key, encodings), vary='Accept-Encoding')
+    if not_modified is not None:
+        return not_modified
+
+    # only the variants this client can use, e.g. ['gzip', 'body']
+    fields = encodings + ['body']
+    cached = await aget_data_api_entry(cache_key, fields + ['soft'])
+    if cached is not None and cached.get('body') is not None:
+        if CACHE_HITS:
+            CACHE_HITS.labels(endpoint=endpoint).inc()
+        if _is_stale(cached):
+            # past the soft TTL: answer now, rebuild behind the response
+            if STALE_SERVED:
+                STALE_SERVED.labels(endpoint=endpoint).inc()
+            _revalidate_async(endpoint, cache_key, lambda: _store_payload(cache_key, build(), ttl))
+        return _bytes_response(cached, encodings, cache_key)
+    else:
+        if CACHE_MISSES:
+            CACHE_MISSES.labels(endpoint=endpoint).inc()
+
+    token, coalesced = await _single_flight(endpoint, cache_key, [cache_key], fields)
+    if coalesced is not None:
+        return _bytes_response(coalesced[cache_key], encodings, cache_key)
+
+    try:
+        return await _build_response(endpoint, build, describe, lambda data: _store_payload(cache_key, data, ttl),
+                                     encodings, cache_key)
+    finally:
+        if token:
+            await arelease_data_api_lease(cache_key, token)
+
+
+def _build_error_response(endpoint: str, exc: Exception):
+    if REQ_ERRORS:
+        REQ_ERRORS.labels(endpoint=endpoint).inc()
+    if isinstance(exc, InvalidCursor):
+        logger.warning('%s rejected cursor: %s', endpoint, exc)
+        return JsonResponse({'error': 'invalid_cursor'}, status=400)
+    logger.error('%s failed: %s', endpoint, exc, exc_info=exc)
+    return JsonResponse({'error': 'internal_error'}, status=500)
+
+
+async def _build_response(endpoint: str, build, describe, encode, encodings, cache_key):
+    """Build the payload, encode it with encode(data) -> variants and answer with it.
+
+    build and encode run in Django's sync thread, where ORM queries and the
+    connection handling of the rest of the project apply unchanged.
+    """
+    def _build_and_encode():
+        data = build()
+        return data, encode(data)
+
+    start = perf_counter()
+    ctx = (REQ_LATENCY.labels(endpoint=endpoint).time() if REQ_LATENCY else _NoopContext())
+    with ctx:
+        try:
+            data, variants = await sync_to_async(_build_and_encode)()
+        except Exception as e:
+            return _build_error_response(endpoint, e)
+    elapsed = perf_counter() - start
+    logger.info(f'{endpoint} served in {elapsed:.3f}s, {describe(data)}, bytes={len(variants["body"])}')
+    return _bytes_response(variants, encodings, cache_key)
+
+
 @csrf_exempt
 @require_POST
-def employees_for_matching(request):
+async def employees_for_matching(request):
     endpoint = 'employees_for_matching'
     if REQ_COUNTER:
         REQ_COUNTER.labels(endpoint=endpoint, method='POST').inc()
@@ -141,41 +549,29 @@ def employees_for_matching(request):
 
     logger.info('Data API: employees_for_matching request', extra={'body': sanitize_request_for_logging(body)})
 
-    cache_key = _cache_key_for_request(endpoint, body)
-    ttl = int(os.getenv('DATA_API_TTL_EMPLOYEES', 300))
-    cached = cache.get(cache_key)
-    if cached is not None:
-        if CACHE_HITS:
-            CACHE_HITS.labels(endpoint=endpoint).inc()
-        return JsonResponse(cached, safe=False)
-    else:
-        if CACHE_MISSES:
-            CACHE_MISSES.labels(endpoint=endpoint).inc()
+    invalid = _normalize_fields(endpoint, body)
+    if invalid is not None:
+        return invalid
 
-    start = perf_counter()
-    ctx = (REQ_LATENCY.labels(endpoint=endpoint).time() if REQ_LATENCY else _NoopContext())
-    with ctx:
-        try:
-            svc = DataAPIService()
-            data = svc.get_employees_for_matching(body)
-            cache.set(cache_key, data, ttl)
-            try:
-                register_data_api_key(endpoint, cache_key, ttl)
-            except Exception:
-                logger.debug('Failed to register cache key for endpoint %s', endpoint)
-            elapsed = perf_counter() - start
-            logger.info(f'employees_for_matching served in {elapsed:.3f}s, count={len(data.get("employees", []))}')
-            return JsonResponse(data, safe=False)
-        except Exception as e:
-            logger.exception('employees_for_matching failed: %s', e)
-            if REQ_ERRORS:
-                REQ_ERRORS.labels(endpoint=endpoint).inc()
-            return JsonResponse({'error': 'internal_error'}, status=500)
+    if _wants_ndjson(request):
+        versions = await aget_data_api_versions(DATA_API_ENDPOINT_DOMAINS[endpoint])
+        etag = (_etag_for(_cache_key_for_request(endpoint, body, versions), variant=NDJSON_CONTENT_TYPE)
+                if versions is not None else None)
+        not_modified = _not_modified(request, endpoint, etag)
+        if not_modified is not None:
+            return not_modified
+        return _with_etag(_stream_employees_ndjson(request, endpoint, body), etag)
+
+    return await _cached_response(
+        request, endpoint, body, _ttl_for(endpoint),
+        lambda: DataAPIService().get_employees_for_matching(body),
+        lambda data: f'count={len(data.get("employees", []))}',
+    )
 
 
 @csrf_exempt
 @require_POST
-def previous_matches(request):
+async def previous_matches(request):
     endpoint = 'previous_matches'
     if REQ_COUNTER:
         REQ_COUNTER.labels(endpoint=endpoint, method='POST').inc()
@@ -185,48 +581,21 @@ def previous_matches(request):
             REQ_ERRORS.labels(endpoint=endpoint).inc()
         return JsonResponse({'error': 'unauthorized'}, status=401)
 
-    try:
-        body = json.loads(request.body.decode('utf-8') or '{}')
-    except Exception:
-        body = {}
-
+    body = _parse_body(request)
     logger.info('Data API: previous_matches request', extra={'body': sanitize_request_for_logging(body)})
+    # the window moves daily: key and ETag must carry the date it was resolved to
+    body['since_date'] = previous_matches_since(body)
 
-    cache_key = _cache_key_for_request(endpoint, body)
-    ttl = int(os.getenv('DATA_API_TTL_PREV_MATCHES', 900))
-    cached = cache.get(cache_key)
-    if cached is not None:
-        if CACHE_HITS:
-            CACHE_HITS.labels(endpoint=endpoint).inc()
-        return JsonResponse(cached, safe=False)
-    else:
-        if CACHE_MISSES:
-            CACHE_MISSES.labels(endpoint=endpoint).inc()
-
-    start = perf_counter()
-    ctx = (REQ_LATENCY.labels(endpoint=endpoint).time() if REQ_LATENCY else _NoopContext())
-    with ctx:
-        try:
-            svc = DataAPIService()
-            data = svc.get_previous_matches(body)
-            cache.set(cache_key, data, ttl)
-            try:
-                register_data_api_key(endpoint, cache_key, ttl)
-            except Exception:
-                logger.debug('Failed to register cache key for endpoint %s', endpoint)
-            elapsed = perf_counter() - start
-            logger.info(f'previous_matches served in {elapsed:.3f}s, count={len(data.get("matches", []))}')
-            return JsonResponse(data, safe=False)
-        except Exception as e:
-            logger.exception('previous_matches failed: %s', e)
-            if REQ_ERRORS:
-                REQ_ERRORS.labels(endpoint=endpoint).inc()
-            return JsonResponse({'error': 'internal_error'}, status=500)
+    return await _cached_response(
+        request, endpoint, body, _ttl_for(endpoint),
+        lambda: DataAPIService().get_previous_matches(body),
+        lambda data: f'count={len(data.get("matches", []))}, has_more={bool(data.get("next_cursor"))}',
+    )
 
 
 @csrf_exempt
 @require_POST
-def employee_interests(request):
+async def employee_interests(request):
     endpoint = 'employee_interests'
     if REQ_COUNTER:
         REQ_COUNTER.labels(endpoint=endpoint, method='POST').inc()
@@ -236,47 +605,169 @@ def employee_interests(request):
             REQ_ERRORS.labels(endpoint=endpoint).inc()
         return JsonResponse({'error': 'unauthorized'}, status=401)
 
-    try:
-        body = json.loads(request.body.decode('utf-8') or '{}')
-    except Exception:
-        body = {}
-
+    body = _parse_body(request)
     logger.info('Data API: employee_interests request', extra={'body': sanitize_request_for_logging(body)})
 
-    cache_key = _cache_key_for_request(endpoint, body)
-    ttl = int(os.getenv('DATA_API_TTL_INTERESTS', 600))
-    cached = cache.get(cache_key)
-    if cached is not None:
-        if CACHE_HITS:
-            CACHE_HITS.labels(endpoint=endpoint).inc()
-        return JsonResponse(cached, safe=False)
-    else:
-        if CACHE_MISSES:
-            CACHE_MISSES.labels(endpoint=endpoint).inc()
+    return await _cached_response(
+        request, endpoint, body, _ttl_for(endpoint),
+        lambda: DataAPIService().get_employee_interests(body),
+        lambda data: f'count={len(data.get("interests", data.get("employees", {})))}',
+    )
+
+
+def _store_bundle_sections(params: dict, sections, keys: dict) -> None:
+    built = DataAPIService().get_matching_bundle(params, sections)
+    for sec in sections:
+        _store_payload(keys[sec], built[sec], _ttl_for(BUNDLE_SECTION_PREFIXES[sec]))
+
+
+@csrf_exempt
+@require_POST
+async def matching_bundle(request):
+    """Employees, interests and previous matches for a matching run in one response.
+
+    Body: the filters of the standalone endpoints (department_ids, active_only,
+    since_days, page_size, employee_ids, ...) plus optional 'sections'. Each section
+    is cached on its own; missing sections are built together from one read snapshot.
+    The response is spliced from the pre-encoded section bodies.
+    """
+    endpoint = 'matching_bundle'
+    if REQ_COUNTER:
+        REQ_COUNTER.labels(endpoint=endpoint, method='POST').inc()
+
+    if not _auth_ok(request):
+        if REQ_ERRORS:
+            REQ_ERRORS.labels(endpoint=endpoint).inc()
+        return JsonResponse({'error': 'unauthorized'}, status=401)
+
+    body = _parse_body(request)
+    requested = body.get('sections') or list(BUNDLE_SECTIONS)
+    if not isinstance(requested, list) or any(sec not in BUNDLE_SECTIONS for sec in requested):
+        return JsonResponse({'error': 'invalid_sections', 'allowed': list(BUNDLE_SECTIONS)}, status=400)
+    sections = [sec for sec in BUNDLE_SECTIONS if sec in requested]
+    params = {k: v for k, v in body.items() if k != 'sections'}
+    if 'previous_matches' in sections:
+        params['since_date'] = previous_matches_since(params)
+    invalid = _normalize_fields(endpoint, params)
+    if invalid is not None:
+        return invalid
+
+    logger.info('Data API: matching_bundle request', extra={'body': sanitize_request_for_logging(params)})
+
+    # one versions read for all sections; section keys take their own domains from it
+    versions = await aget_data_api_versions(DATA_API_DOMAINS)
+    if versions is None:
+        return await _build_response(
+            endpoint, lambda: DataAPIService().get_matching_bundle(params, sections),
+            lambda data: f'sections={sections}', lambda data: {'body': _encode_body(data)}, (), None,
+        )
+
+    etag = _etag_for(_cache_key_for_request(endpoint, {'sections': sections, 'params': params}, versions))
+    not_modified = _not_modified(request, endpoint, etag)
+    if not_modified is not None:
+        return not_modified
+
+    # employees/previous_matches sections equal the standalone payloads for the same
+    # params and share their entries; interests are scoped to the bundle roster. Only
+    # the employees section depends on the 'fields' projection.
+    unprojected = {k: v for k, v in params.items() if k != 'fields'}
+    section_bodies = {'employees': params, 'interests': {'bundle': unprojected}, 'previous_matches': unprojected}
+    keys = {
+        sec: _cache_key_for_request(BUNDLE_SECTION_PREFIXES[sec], section_bodies[sec], versions)
+        for sec in sections
+    }
+    bodies = {}
+    stale = []
+    for sec in sections:
+        entry = await aget_data_api_entry(keys[sec], ['body', 'soft'])
+        if entry is not None and entry.get('body') is not None:
+            bodies[sec] = entry['body']
+            if _is_stale(entry):
+                stale.append(sec)
+    missing = [sec for sec in sections if sec not in bodies]
+    if stale:
+        if STALE_SERVED:
+            STALE_SERVED.labels(endpoint=endpoint).inc(len(stale))
+        _revalidate_async(endpoint, _cache_key_for_request(endpoint, {'sections': stale, 'params': params}, versions),
+                          lambda: _store_bundle_sections(params, stale, keys))
+    if CACHE_HITS and len(bodies):
+        CACHE_HITS.labels(endpoint=endpoint).inc(len(bodies))
+    if CACHE_MISSES and missing:
+        CACHE_MISSES.labels(endpoint=endpoint).inc(len(missing))
+
+    token = None
+    if missing:
+        lease_key = _cache_key_for_request(endpoint, {'sections': missing, 'params': params}, versions)
+        token, coalesced = await _single_flight(endpoint, lease_key, [keys[sec] for sec in missing], ['body'])
+        if coalesced is not None:
+            for sec in missing:
+                bodies[sec] = coalesced[keys[sec]]['body']
+            missing = []
+
+    if missing:
+        start = perf_counter()
+        ctx = (REQ_LATENCY.labels(endpoint=endpoint).time() if REQ_LATENCY else _NoopContext())
+        def _build_missing():
+            built = DataAPIService().get_matching_bundle(params, missing)
+            return {sec: _store_payload(keys[sec], built[sec], _ttl_for(BUNDLE_SECTION_PREFIXES[sec]))['body']
+                    for sec in missing}
+
+        try:
+            with ctx:
+                try:
+                    bodies.update(await sync_to_async(_build_missing)())
+                except Exception as e:
+                    return _build_error_response(endpoint, e)
+        finally:
+            if token:
+                await arelease_data_api_lease(lease_key, token)
+        logger.info(f'matching_bundle built {missing} in {perf_counter() - start:.3f}s')
+
+    payload = b'{' + b','.join(json.dumps(sec).encode('utf-8') + b':' + bodies[sec] for sec in sections) + b'}'
+    return _with_etag(HttpResponse(payload, content_type='application/json'), etag)
+
+
+@csrf_exempt
+@require_POST
+async def employees_delta(request):
+    """Roster changes since a cursor; not cached since every client holds its own watermark."""
+    endpoint = 'employees_delta'
+    if REQ_COUNTER:
+        REQ_COUNTER.labels(endpoint=endpoint, method='POST').inc()
+
+    if not _auth_ok(request):
+        if REQ_ERRORS:
+            REQ_ERRORS.labels(endpoint=endpoint).inc()
+        return JsonResponse({'error': 'unauthorized'}, status=401)
+
+    body = _parse_body(request)
+    logger.info('Data API: employees_delta request', extra={'body': sanitize_request_for_logging(body)})
 
     start = perf_counter()
     ctx = (REQ_LATENCY.labels(endpoint=endpoint).time() if REQ_LATENCY else _NoopContext())
     with ctx:
         try:
             svc = DataAPIService()
-            data = svc.get_employee_interests(body)
-            cache.set(cache_key, data, ttl)
-            try:
-                register_data_api_key(endpoint, cache_key, ttl)
-            except Exception:
-                logger.debug('Failed to register cache key for endpoint %s', endpoint)
+            data = await sync_to_async(svc.get_employees_delta)(body)
             elapsed = perf_counter() - start
-            logger.info(f'employee_interests served in {elapsed:.3f}s, count={len(data.get("interests", {}))}')
+            logger.info(f'employees_delta served in {elapsed:.3f}s, full_resync={data["full_resync"]}, '
+                        f'employees={len(data["employees"])}, interests={len(data["interests"])}, '
+                        f'deactivated={len(data["deactivated"])}')
             return JsonResponse(data, safe=False)
+        except InvalidCursor as e:
+            logger.warning('employees_delta rejected cursor: %s', e)
+            if REQ_ERRORS:
+                REQ_ERRORS.labels(endpoint=endpoint).inc()
+            return JsonResponse({'error': 'invalid_cursor'}, status=400)
         except Exception as e:
-            logger.exception('employee_interests failed: %s', e)
+            logger.exception('employees_delta failed: %s', e)
             if REQ_ERRORS:
                 REQ_ERRORS.labels(endpoint=endpoint).inc()
             return JsonResponse({'error': 'internal_error'}, status=500)
 
 
 @require_GET
-def health(request):
+async def health(request):
     payload = {
         'status': 'OK',
         'service': 'connectbot-data-api',
@@ -5,5 +5,7 @@ urlpatterns = [
     path('employees-for-matching', data_api.employees_for_matching, name='employees_for_matching'),
     path('previous-matches', data_api.previous_matches, name='previous_matches'),
     path('employee-interests', data_api.employee_interests, name='employee_interests'),
+    path('matching-bundle', data_api.matching_bundle, name='matching_bundle'),
+    path('employees-delta', data_api.employees_delta, name='employees_delta'),
     path('health', data_api.health, name='data_api_health'),
 ]
@@ -2,7 +2,11 @@
 
 Do not include PII fields (telegram_id, telegram_username, email, phone, etc.).
 """
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+# optional fields of a serialized employee, in output order; 'id' is always included
+EMPLOYEE_FIELDS = ('full_name', 'department', 'position', 'business_center', 'interests', 'is_active')
+
 
 def serialize_department(dept) -> Dict[str, Any]:
     if not dept:
@@ -22,11 +26,51 @@ def serialize_interest(interest) -> Dict[str, Any]:
     }
 
 
-def serialize_employee(emp) -> Dict[str, Any]:
-    # Only include non-PII fields per spec
-    deps = serialize_department(getattr(emp, 'department', None))
-    # business_center has similar shape to Department; reuse serializer
-    business_center = serialize_department(getattr(emp, 'business_center', None))
+def normalize_employee_fields(fields) -> Optional[Tuple[str, ...]]:
+    """Validate a request's 'fields' projection; None means all fields.
+
+    Returns the requested fields in EMPLOYEE_FIELDS order so equivalent
+    projections share a cache key. Raises ValueError on unknown fields.
+    """
+    if fields is None:
+        return None
+    if not isinstance(fields, list) or not all(isinstance(f, str) for f in fields):
+        raise ValueError('fields must be a list of field names')
+    unknown = set(fields) - set(EMPLOYEE_FIELDS) - {'id'}
+    if unknown:
+        raise ValueError(f'unknown fields: {sorted(unknown)}')
+    return tuple(f for f in EMPLOYEE_FIELDS if f in fields)
+
+
+def project_employee(serialized: Dict[str, Any], fields: Optional[Iterable[str]]) -> Dict[str, Any]:
+    """Restrict an already serialized employee to id plus fields (None keeps everything)."""
+    if fields is None:
+        return serialized
+    return {k: v for k, v in serialized.items() if k == 'id' or k in fields}
+
+
+def serialize_employee(emp, fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    # Only include non-PII fields per spec; with fields, only id and those
+    # fields are read, so deferred/unprefetched relations are never touched
+    wanted = EMPLOYEE_FIELDS if fields is None else fields
+    out = {'id': str(getattr(emp, 'id', None))}
+    if 'full_name' in wanted:
+        out['full_name'] = getattr(emp, 'full_name', None) or getattr(emp, 'display_name', None)
+    if 'department' in wanted:
+        out['department'] = serialize_department(getattr(emp, 'department', None))
+    if 'position' in wanted:
+        out['position'] = getattr(emp, 'position', None)
+    if 'business_center' in wanted:
+        # business_center has similar shape to Department; reuse serializer
+        out['business_center'] = serialize_department(getattr(emp, 'business_center', None))
+    if 'interests' in wanted:
+        out['interests'] = _serialize_employee_interests(emp)
+    if 'is_active' in wanted:
+        out['is_active'] = bool(getattr(emp, 'is_active', False))
+    return out
+
+
+def _serialize_employee_interests(emp) -> List[Dict[str, Any]]:
     # try related_name 'interests' first (EmployeeInterest related_name)
     interests_qs = getattr(emp, 'interests', None) or getattr(emp, 'employeeinterest_set', None)
     interests_list = []
@@ -43,16 +87,7 @@ def serialize_employee(emp) -> Dict[str, Any]:
                     interests_list.append(serialize_interest(it))
             except Exception:
                 interests_list = []
-
-    return {
-        'id': str(getattr(emp, 'id', None)),
-        'full_name': getattr(emp, 'full_name', None) or getattr(emp, 'display_name', None),
-        'department': deps,
-        'position': getattr(emp, 'position', None),
-        'business_center': business_center,
-        'interests': interests_list,
-        'is_active': bool(getattr(emp, 'is_active', False)),
-    }
+    return interests_list
 
 
 def sanitize_request_for_logging(body: Dict[str, Any]) -> Dict[str, Any]:
@@ -64,4 +99,12 @@ def sanitize_request_for_logging(body: Dict[str, Any]) -> Dict[str, Any]:
         out['employees_count'] = len(body.get('employees') or [])
     if 'since' in body:
         out['since'] = body.get('since')
+    if 'employee_ids' in body:
+        out['employee_ids_count'] = len(body.get('employee_ids') or [])
+    if 'page_size' in body:
+        out['page_size'] = body.get('page_size')
+    if 'cursor' in body:
+        out['has_cursor'] = bool(body.get('cursor'))
+    if 'fields' in body:
+        out['fields'] = body.get('fields')
     return out
@@ -1,6 +1,13 @@
+import os
+import time
+import uuid
+import asyncio
 import logging
-from typing import List
+import weakref
+from typing import Dict, Iterable, List, Optional
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.core.cache import cache
 
 try:
@@ -8,119 +15,374 @@ try:
 except Exception:  # pragma: no cover - optional runtime
     get_redis_connection = None
 
+try:
+    import redis.asyncio as aioredis
+except Exception:  # pragma: no cover - optional runtime
+    aioredis = None
+
 logger = logging.getLogger(__name__)
 
 
-def _delete_pattern_with_redis(pattern: str) -> int:
-    """Delete keys matching pattern using redis connection. Returns number of deleted keys."""
+def _raw_redis():
+    """Return the raw redis client behind the default cache, or None for other backends."""
     if not get_redis_connection:
-        logger.warning('django_redis.get_redis_connection not available; skipping pattern delete for %s', pattern)
-        return 0
+        return None
+    try:
+        return get_redis_connection('default')
+    except NotImplementedError:
+        # non-redis cache backend (local development, tests)
+        return None
+
+
+def get_data_api_entry(key: str, fields: List[str]) -> Optional[Dict[str, Optional[bytes]]]:
+    """Fetch pre-encoded response variants stored under key.
 
+    Entries are raw Redis hashes (field -> bytes) so a hit needs one HMGET and no
+    unpickling/decompression. Returns None on a miss (no requested field present).
+    Falls back to the Django cache when redis is not the backend.
+    """
     try:
-        conn = get_redis_connection('default')
-        deleted = 0
-        for key in conn.scan_iter(match=pattern):
-            try:
-                conn.delete(key)
-                deleted += 1
-            except Exception:
-                logger.exception('failed to delete redis key %s', key)
-        logger.info('Deleted %d keys matching pattern %s', deleted, pattern)
-        return deleted
+        conn = _raw_redis()
+        if conn is None:
+            entry = cache.get(key)
+            if not entry:
+                return None
+            values = [entry.get(f) for f in fields]
+        else:
+            values = conn.hmget(key, fields)
+        if all(v is None for v in values):
+            return None
+        return dict(zip(fields, values))
+    except Exception:
+        logger.exception('get_data_api_entry failed for %s', key)
+        return None
+
+
+def set_data_api_entry(key: str, variants: Dict[str, bytes], ttl: int) -> bool:
+    """Store pre-encoded response variants (e.g. {'body': ..., 'gzip': ...}) under key for ttl seconds."""
+    try:
+        conn = _raw_redis()
+        if conn is None:
+            cache.set(key, dict(variants), ttl)
+            return True
+        pipe = conn.pipeline()
+        pipe.delete(key)
+        pipe.hset(key, mapping=variants)
+        pipe.expire(key, int(ttl))
+        pipe.execute()
+        return True
     except Exception:
-        logger.exception('Error while deleting keys by pattern %s', pattern)
-        return 0
+        logger.exception('set_data_api_entry failed for %s', key)
+        return False
+
 
+# compare-and-delete: only the lease holder may release it
+_RELEASE_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
 
-def _index_set_name(prefix: str) -> str:
-    return f"data_api_index:{prefix}"
 
+def _lease_key(key: str) -> str:
+    return f"{key}:lease"
 
-def register_data_api_key(prefix: str, full_key: str, ttl: int = None) -> bool:
-    """Register a data_api cache key into a Redis set index for the prefix.
 
-    Returns True on success (best-effort). If redis connection not available, no-op.
+def acquire_data_api_lease(key: str, ttl_seconds: float) -> Optional[str]:
+    """Try to become the single worker that rebuilds the entry for key.
+
+    Returns a token on success (pass it to release_data_api_lease) or None if
+    another worker holds a live lease. Without redis every caller gets a token,
+    i.e. no coalescing.
+    """
+    token = uuid.uuid4().hex
+    try:
+        conn = _raw_redis()
+        if conn is None:
+            return token
+        if conn.set(_lease_key(key), token, nx=True, px=max(1, int(ttl_seconds * 1000))):
+            return token
+        return None
+    except Exception:
+        logger.exception('acquire_data_api_lease failed for %s', key)
+        # fail open: computing twice is better than not computing
+        return token
+
+
+def release_data_api_lease(key: str, token: str) -> None:
+    try:
+        conn = _raw_redis()
+        if conn is not None:
+            conn.eval(_RELEASE_LEASE_SCRIPT, 1, _lease_key(key), token)
+    except Exception:
+        logger.exception('release_data_api_lease failed for %s', key)
+
+
+# Data domains whose content version changes when the underlying rows change,
+# and the domains each Data API endpoint depends on.
+DATA_API_DOMAINS = ('employees', 'interests', 'previous_matches')
+DATA_API_ENDPOINT_DOMAINS = {
+    'employees_for_matching': ('employees', 'interests'),
+    'employee_interests': ('employees', 'interests'),
+    'previous_matches': ('previous_matches',),
+    'matching_bundle': DATA_API_DOMAINS,
+}
+
+
+# Pair history sent to the matching service (CoffeePair); its version tags
+# cached matching results. Not a Data API endpoint domain.
+MATCHING_HISTORY_DOMAIN = 'coffee_pairs'
+
+
+def _version_key(domain: str) -> str:
+    return f"data_api_version:{domain}"
+
+
+def _initial_version() -> int:
+    # seed from the clock so a lost counter never returns to a value an old ETag was built from
+    return int(time.time() * 1000)
+
+
+def get_data_api_versions(domains: Iterable[str]) -> Optional[Dict[str, int]]:
+    """Return the current content version of each domain (one cache round trip when warm).
+
+    Returns None if any version cannot be read (e.g. cache backend down): callers
+    must then treat content as unversioned rather than assume nothing changed.
+    """
+    domains = list(domains)
+    keys = {_version_key(d): d for d in domains}
+    try:
+        found = cache.get_many(list(keys))
+        versions = {keys[k]: int(v) for k, v in found.items()}
+        for domain in domains:
+            if domain not in versions:
+                key = _version_key(domain)
+                cache.add(key, _initial_version(), None)
+                value = cache.get(key)
+                if value is None:
+                    return None
+                versions[domain] = int(value)
+        return versions
+    except Exception:
+        logger.exception('get_data_api_versions failed for %s', domains)
+        return None
+
+
+def bump_data_api_version(domain: str) -> Optional[int]:
+    """Advance the content version of a domain. Call after the cached data was invalidated."""
+    key = _version_key(domain)
+    try:
+        try:
+            version = cache.incr(key)
+        except ValueError:
+            version = None
+        if version is None:
+            # counter missing (first write or evicted): start over from the clock
+            version = _initial_version()
+            cache.set(key, version, None)
+        return int(version)
+    except Exception:
+        logger.exception('bump_data_api_version failed for %s', domain)
+        return None
+
+
+def data_api_generation(prefix: str, versions: Dict[str, int]) -> str:
+    """Generation tag embedded in the cache keys of an endpoint.
+
+    Built from the versions of the domains the endpoint depends on, so bumping
+    any of them moves every key of that endpoint to a new, empty namespace.
+    """
+    return 'g' + '.'.join(str(versions[d]) for d in DATA_API_ENDPOINT_DOMAINS[prefix])
+
+
+def invalidate_data_api_domains(domains: Iterable[str]) -> int:
+    """Invalidate every Data API entry built from the given domains.
+
+    One INCR per domain: entries of the previous generation are never read
+    again and simply expire by TTL. Returns the number of domains bumped.
+    """
+    return sum(1 for d in set(domains) if bump_data_api_version(d) is not None)
+
+
+def invalidate_data_api_prefixes(prefixes: List[str]) -> int:
+    """Invalidate Data API cache for given list of prefix names (endpoints).
+
+    Bumps the domains those endpoints depend on; see invalidate_data_api_domains.
+    """
+    domains = set()
+    for p in prefixes:
+        domains.update(DATA_API_ENDPOINT_DOMAINS.get(p, ()))
+    return invalidate_data_api_domains(domains)
+
+
+def invalidate_all_data_api() -> int:
+    """Invalidate all Data API related caches."""
+    return invalidate_data_api_domains(DATA_API_DOMAINS)
+
+
+def _tombstone_set_name(domain: str) -> str:
+    return f"data_api_tombstones:{domain}"
+
+
+def tombstone_retention_seconds() -> int:
+    """How long deletions are remembered for delta sync (DATA_API_TOMBSTONE_RETENTION)."""
+    return int(os.getenv('DATA_API_TOMBSTONE_RETENTION', 7 * 24 * 3600))
+
+
+def record_data_api_tombstone(domain: str, object_id) -> bool:
+    """Remember that object_id was deleted/changed in domain, for delta sync.
+
+    Stored in a Redis sorted set scored by unix time; entries older than the
+    retention window are trimmed on write. Best-effort: returns False if redis
+    is unavailable.
     """
     if not get_redis_connection:
-        logger.debug('register_data_api_key: redis not available; skipping registry for %s', full_key)
         return False
-
     try:
         conn = get_redis_connection('default')
-        set_name = _index_set_name(prefix)
-        conn.sadd(set_name, full_key)
-        if ttl:
-            try:
-                # set expiration for index slightly longer than item ttl
-                conn.expire(set_name, max(60, int(ttl) * 2))
-            except Exception:
-                logger.debug('Failed to set expire on index %s', set_name)
+        set_name = _tombstone_set_name(domain)
+        now = time.time()
+        retention = tombstone_retention_seconds()
+        pipe = conn.pipeline()
+        pipe.zadd(set_name, {str(object_id): now})
+        pipe.zremrangebyscore(set_name, '-inf', now - retention)
+        pipe.expire(set_name, retention)
+        pipe.execute()
         return True
     except Exception:
-        logger.exception('register_data_api_key failed for %s', full_key)
+        logger.exception('record_data_api_tombstone failed for %s:%s', domain, object_id)
         return False
 
 
-def get_registered_data_api_keys(prefix: str):
-    """Return list of registered keys for a prefix (or empty list)."""
+def get_data_api_tombstones(domain: str, since_ts: float) -> Optional[List[str]]:
+    """Return ids tombstoned in domain after since_ts, or None if redis is unavailable.
+
+    None means "unknown" and callers must fall back to a full resync.
+    """
     if not get_redis_connection:
-        return []
+        return None
     try:
         conn = get_redis_connection('default')
-        set_name = _index_set_name(prefix)
-        members = conn.smembers(set_name) or []
-        # members are bytes in redis-py, convert to str
+        members = conn.zrangebyscore(_tombstone_set_name(domain), f'({since_ts}', '+inf') or []
         return [m.decode('utf-8') if isinstance(m, (bytes, bytearray)) else str(m) for m in members]
     except Exception:
-        logger.exception('get_registered_data_api_keys failed for %s', prefix)
-        return []
+        logger.exception('get_data_api_tombstones failed for %s', domain)
+        return None
 
 
-def delete_registered_data_api_keys(prefix: str) -> int:
-    """Delete all registered keys for a prefix and remove index. Returns deleted count."""
-    if not get_redis_connection:
-        # fallback to SCAN deletion
-        return _delete_pattern_with_redis(f"data_api:{prefix}:*")
+# --- asyncio variants for the async Data API views --------------------------------
+# Same keys and encodings as the sync functions above, over a redis.asyncio client,
+# so cache hits never wait on a worker thread. Without Redis they call the sync
+# versions directly: the Django cache fallback is in-process and does no I/O.
 
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _async_redis():
+    """redis.asyncio client for the running event loop, or None for non-redis backends."""
+    if aioredis is None or _raw_redis() is None:
+        return None
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        conf = settings.CACHES['default']
+        location = conf['LOCATION']
+        if isinstance(location, (list, tuple)):
+            location = location[0]
+        options = conf.get('OPTIONS', {})
+        kwargs = dict(options.get('CONNECTION_POOL_KWARGS', {}))
+        if options.get('PASSWORD'):
+            kwargs['password'] = options['PASSWORD']
+        client = aioredis.Redis.from_url(location, **kwargs)
+        _async_clients[loop] = client
+    return client
+
+
+async def aget_data_api_versions(domains: Iterable[str]) -> Optional[Dict[str, int]]:
+    """Async get_data_api_versions: one MGET of the version counters when they exist."""
+    domains = list(domains)
+    client = _async_redis()
+    if client is None:
+        return get_data_api_versions(domains)
     try:
-        conn = get_redis_connection('default')
-        set_name = _index_set_name(prefix)
-        members = conn.smembers(set_name) or []
-        deleted = 0
-        for key in members:
-            try:
-                conn.delete(key)
-                deleted += 1
-            except Exception:
-                logger.exception('failed to delete registered key %s', key)
-        try:
-            conn.delete(set_name)
-        except Exception:
-            logger.debug('failed to delete index set %s', set_name)
-        logger.info('Deleted %d registered keys for prefix %s', deleted, prefix)
-        return deleted
+        # counters are written through the Django cache; django-redis stores ints unpickled
+        values = await client.mget([cache.make_key(_version_key(d)) for d in domains])
+        if all(v is not None for v in values):
+            return {d: int(v) for d, v in zip(domains, values)}
     except Exception:
-        logger.exception('delete_registered_data_api_keys failed for %s', prefix)
-        return 0
+        logger.exception('aget_data_api_versions failed for %s', domains)
+        return None
+    # a counter is missing: seed it through the sync path
+    return await sync_to_async(get_data_api_versions, thread_sensitive=False)(domains)
 
 
-def invalidate_data_api_prefixes(prefixes: List[str]) -> int:
-    """Invalidate Data API cache for given list of prefix names.
+async def aget_data_api_entry(key: str, fields: List[str]) -> Optional[Dict[str, Optional[bytes]]]:
+    """Async get_data_api_entry."""
+    client = _async_redis()
+    if client is None:
+        return get_data_api_entry(key, fields)
+    try:
+        values = await client.hmget(key, fields)
+        if all(v is None for v in values):
+            return None
+        return dict(zip(fields, values))
+    except Exception:
+        logger.exception('aget_data_api_entry failed for %s', key)
+        return None
 
-    Data API cache keys: data_api:{prefix}:{sha256}
-    We delete keys by pattern: data_api:{prefix}:*
-    Returns total deleted keys count (best-effort).
-    """
-    total = 0
-    for p in prefixes:
-        # prefer registry-based deletion
-        deleted = delete_registered_data_api_keys(p)
-        total += deleted
-    return total
 
+async def aacquire_data_api_lease(key: str, ttl_seconds: float) -> Optional[str]:
+    """Async acquire_data_api_lease."""
+    client = _async_redis()
+    if client is None:
+        return uuid.uuid4().hex
+    token = uuid.uuid4().hex
+    try:
+        if await client.set(_lease_key(key), token, nx=True, px=max(1, int(ttl_seconds * 1000))):
+            return token
+        return None
+    except Exception:
+        logger.exception('aacquire_data_api_lease failed for %s', key)
+        return token
 
-def invalidate_all_data_api() -> int:
-    """Invalidate all Data API related caches (employees, previous_matches, employee_interests)."""
-    prefixes = ['employees_for_matching', 'previous_matches', 'employee_interests']
-    return invalidate_data_api_prefixes(prefixes)
+
+async def arelease_data_api_lease(key: str, token: str) -> None:
+    """Async release_data_api_lease."""
+    client = _async_redis()
+    if client is None:
+        return
+    try:
+        await client.eval(_RELEASE_LEASE_SCRIPT, 1, _lease_key(key), token)
+    except Exception:
+        logger.exception('arelease_data_api_lease failed for %s', key)
+
+
+async def await_data_api_entries(lease_key: str, keys: List[str], fields: List[str], timeout: float,
+                                 poll_interval: float = 0.05) -> Optional[Dict[str, Dict[str, Optional[bytes]]]]:
+    """Wait while another worker holds the lease on lease_key, then read keys.
+
+    Returns {key: entry} once every key has an entry, or None if the lease was
+    released/expired without producing them or timeout passed. On None the
+    caller computes the entries itself. Polling sleeps on the event loop, so
+    other requests keep being served meanwhile.
+    """
+    client = _async_redis()
+    if client is None:
+        return None
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            pipe = client.pipeline()
+            for key in keys:
+                pipe.hmget(key, fields)
+            pipe.exists(_lease_key(lease_key))
+            *values, lease_alive = await pipe.execute()
+            if all(any(v is not None for v in vals) for vals in values):
+                return {key: dict(zip(fields, vals)) for key, vals in zip(keys, values)}
+            if not lease_alive or time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(poll_interval)
+    except Exception:
+        logger.exception('await_data_api_entries failed for %s', lease_key)
+        return None
@@ -1,17 +1,64 @@
 """Business logic for Data API: query existing Django models and return
 serialized data structures suitable for the Java matching service.
 """
-from typing import Dict, Any, List
-from datetime import datetime, timedelta
+from typing import Dict, Any, List, Iterator, AsyncIterator, Optional
+from datetime import date, datetime, timedelta
+import os
+import json
+import base64
 import logging
 
-from django.db.models import Prefetch
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.utils import timezone
 
-from python_app.serializers.data_serializers import serialize_employee, serialize_interest
+from python_app.serializers.data_serializers import (
+    EMPLOYEE_FIELDS, serialize_employee, serialize_interest, normalize_employee_fields, project_employee,
+)
+from python_app.services import cache_utils, roster_snapshot
 
 logger = logging.getLogger(__name__)
 
 
+# sections of the single-round-trip matching bundle, in response order
+BUNDLE_SECTIONS = ('employees', 'interests', 'previous_matches')
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client passes a cursor that cannot be decoded."""
+
+
+def encode_cursor(data: Dict[str, Any]) -> str:
+    """Encode cursor state as an opaque url-safe token."""
+    raw = json.dumps(data, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str) -> Dict[str, Any]:
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception as e:
+        raise InvalidCursor(f'malformed cursor: {e}') from e
+    if not isinstance(data, dict):
+        raise InvalidCursor('malformed cursor')
+    return data
+
+
+def previous_matches_since(params: Dict[str, Any]) -> str:
+    """ISO date of the oldest session week get_previous_matches returns for params.
+
+    Resolved once per request by the view, so the cache key, the ETag and the
+    query all use the same window even when the day changes in between.
+    """
+    try:
+        since_days = int(params.get('since_days', 90))
+    except (TypeError, ValueError):
+        since_days = 90
+    return (datetime.utcnow().date() - timedelta(days=since_days)).isoformat()
+
+
 class DataAPIService:
     def __init__(self):
         # import models lazily to avoid startup ordering issues
@@ -21,21 +68,25 @@ class DataAPIService:
         self.Interest = Interest
         self.EmployeeInterest = EmployeeInterest
         try:
-            from employees.models import SecretCoffeeMeeting
+            from activities.models import SecretCoffeeMeeting
             self.SecretCoffeeMeeting = SecretCoffeeMeeting
         except Exception:
             # SecretCoffeeMeeting may not be importable in some test setups; handle gracefully
             self.SecretCoffeeMeeting = None
 
-    def get_employees_for_matching(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        """Return employees payload according to spec. Accepts optional filters in params.
+    def _employees_queryset(self, params: Dict[str, Any], with_interests: bool = False):
+        """Build the employees queryset shared by the buffered and streaming paths.
 
-        params may contain:
-          - algorithm_type: string (used to vary what fields to include)
-          - department_ids: list
-          - active_only: bool
+        With a 'fields' projection only the needed columns are loaded and only the
+        needed relations are joined/prefetched; with_interests forces the interests
+        prefetch (the bundle derives its interests section from these rows).
         """
-        qs = self.Employee.objects.select_related('department')
+        fields = normalize_employee_fields(params.get('fields'))
+        wanted = EMPLOYEE_FIELDS if fields is None else fields
+        related = [f for f in ('department', 'business_center') if f in wanted]
+        qs = self.Employee.objects.select_related(*related) if related else self.Employee.objects.all()
+        if fields is not None:
+            qs = qs.only('id', *(f for f in fields if f != 'interests'))
 
         if params.get('active_only', True):
             qs = qs.filter(is_active=True)
@@ -44,41 +95,147 @@ class DataAPIService:
         if dept_ids:
             qs = qs.filter(department_id__in=dept_ids)
         # prefetch interests via EmployeeInterest -> Interest (related_name='interests')
-        qs = qs.prefetch_related(Prefetch('interests', queryset=self.EmployeeInterest.objects.select_related('interest')))
+        if 'interests' in wanted or with_interests:
+            qs = qs.prefetch_related(Prefetch('interests', queryset=self.EmployeeInterest.objects.select_related('interest')))
+        return qs
+
+    def get_employees_for_matching(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Return employees payload according to spec. Accepts optional filters in params.
+
+        params may contain:
+          - algorithm_type: string (used to vary what fields to include)
+          - department_ids: list
+          - active_only: bool
+          - fields: optional projection, see data_serializers.EMPLOYEE_FIELDS
+        """
+        fields = normalize_employee_fields(params.get('fields'))
+        snapshot = roster_snapshot.get_snapshot()
+        if snapshot is not None:
+            employees = snapshot.employees(params.get('active_only', True), params.get('department_ids'))
+            if fields is not None:
+                employees = [project_employee(emp, fields) for emp in employees]
+            return {'employees': employees, 'generated_at': datetime.utcnow().isoformat()}
+
+        qs = self._employees_queryset(params)
 
         employees = []
         for e in qs:
-            employees.append(serialize_employee(e))
+            employees.append(serialize_employee(e, fields))
 
         return {'employees': employees, 'generated_at': datetime.utcnow().isoformat()}
 
-    def get_previous_matches(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        """Return recent SecretCoffeeMeeting history.
+    def iter_employees_for_matching(self, params: Dict[str, Any], chunk_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Yield serialized employees one by one, reading the queryset in chunks.
 
-        params may include 'since_days' to limit the window.
+        Same filters as get_employees_for_matching. Only ``chunk_size`` rows (and
+        their prefetched interests) are held in memory at a time; with the roster
+        snapshot the rows are already in memory and are yielded from it.
         """
-        since_days = int(params.get('since_days', 90))
-        since_date = datetime.utcnow().date() - timedelta(days=since_days)
+        fields = normalize_employee_fields(params.get('fields'))
+        snapshot = roster_snapshot.get_snapshot()
+        if snapshot is not None:
+            for emp in snapshot.employees(params.get('active_only', True), params.get('department_ids')):
+                yield project_employee(emp, fields)
+            return
+        qs = self._employees_queryset(params).order_by('id')
+        for e in qs.iterator(chunk_size=chunk_size):
+            yield serialize_employee(e, fields)
+
+    async def aiter_employees_for_matching(self, params: Dict[str, Any], chunk_size: int = 500) -> AsyncIterator[Dict[str, Any]]:
+        """Async iter_employees_for_matching for the ASGI views.
+
+        The snapshot lookup (which may rebuild it) runs in the sync thread; the
+        query path reads chunks with the async ORM, so the event loop is free
+        between chunks.
+        """
+        fields = normalize_employee_fields(params.get('fields'))
+        snapshot = await sync_to_async(roster_snapshot.get_snapshot)()
+        if snapshot is not None:
+            for emp in snapshot.employees(params.get('active_only', True), params.get('department_ids')):
+                yield project_employee(emp, fields)
+            return
+        qs = self._employees_queryset(params).order_by('id')
+        async for e in qs.aiterator(chunk_size=chunk_size):
+            yield serialize_employee(e, fields)
+
+    def get_previous_matches(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Return SecretCoffeeMeeting history, newest first, one keyset page at a time.
+
+        params may include:
+          - since_days: limit the window by session week (default 90)
+          - since_date: resolved window start (previous_matches_since); overrides since_days
+          - employee_ids: only meetings involving any of these employees
+          - page_size: rows per page (default DATA_API_PREV_MATCHES_PAGE_SIZE, also used
+            when the value is not an integer; capped)
+          - cursor: opaque next_cursor from the previous page
 
+        Pages are ordered by (created_at, id) descending and continue strictly after
+        the cursor position, so each page is an index range scan (no OFFSET).
+        next_cursor is None on the last page.
+        """
         if not self.SecretCoffeeMeeting:
-            return {'matches': [], 'count': 0}
+            return {'matches': [], 'count': 0, 'next_cursor': None}
+
+        since_date = date.fromisoformat(params.get('since_date') or previous_matches_since(params))
+        default_size = int(os.getenv('DATA_API_PREV_MATCHES_PAGE_SIZE', 1000))
+        max_size = int(os.getenv('DATA_API_PREV_MATCHES_MAX_PAGE_SIZE', 5000))
+        try:
+            page_size = int(params.get('page_size') or default_size)
+        except (TypeError, ValueError):
+            # a malformed page_size is not worth failing the request over
+            page_size = default_size
+        page_size = max(1, min(page_size, max_size))
 
-        qs = self.SecretCoffeeMeeting.objects.select_related('employee1', 'employee2')
-        qs = qs.filter(week_start__gte=since_date).order_by('-created_at')[:1000]
+        qs = self.SecretCoffeeMeeting.objects.filter(activity_session__week_start__gte=since_date)
+
+        employee_ids = params.get('employee_ids')
+        if employee_ids:
+            # served by the employee1/employee2 foreign key indexes
+            qs = qs.filter(Q(employee1_id__in=employee_ids) | Q(employee2_id__in=employee_ids))
+
+        token = params.get('cursor')
+        if token:
+            data = decode_cursor(str(token))
+            try:
+                after_created = datetime.fromisoformat(data['c'])
+                after_id = int(data['id'])
+            except (KeyError, TypeError, ValueError) as e:
+                raise InvalidCursor('cursor has no valid position') from e
+            qs = qs.filter(Q(created_at__lt=after_created) | Q(created_at=after_created, id__lt=after_id))
+
+        rows = list(
+            qs.order_by('-created_at', '-id')
+            .values_list('id', 'employee1_id', 'employee2_id', 'created_at', 'activity_session__week_start')[:page_size + 1]
+        )
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
 
         out = []
-        for m in qs:
-            out.append({'employee1_id': str(m.employee1_id), 'employee2_id': str(m.employee2_id), 'created_at': m.created_at.isoformat(), 'week_start': m.week_start.isoformat()})
+        for _id, emp1_id, emp2_id, created_at, week_start in rows:
+            out.append({'employee1_id': str(emp1_id), 'employee2_id': str(emp2_id), 'created_at': created_at.isoformat(), 'week_start': week_start.isoformat()})
+
+        next_cursor = None
+        if has_more:
+            last_id, _, _, last_created, _ = rows[-1]
+            next_cursor = encode_cursor({'v': 1, 'c': last_created.isoformat(), 'id': last_id})
 
-        return {'matches': out, 'count': len(out)}
+        return {'matches': out, 'count': len(out), 'next_cursor': next_cursor}
 
     def get_employee_interests(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Return mapping of employee_id -> interests list.
 
         Optional params:
           - employee_ids: list
+          - format: 'nested' (default) or 'columnar', see get_employee_interests_columnar
+          - inverted_index: with format='columnar', also return interest_id -> employee ids
         """
+        if params.get('format') == 'columnar':
+            return self.get_employee_interests_columnar(params)
         employee_ids = params.get('employee_ids')
+        snapshot = roster_snapshot.get_snapshot()
+        if snapshot is not None:
+            return {'interests': snapshot.interests(employee_ids)}
+
         qs = self.EmployeeInterest.objects.select_related('interest')
         if employee_ids:
             qs = qs.filter(employee_id__in=employee_ids)
@@ -89,3 +246,183 @@ class DataAPIService:
             mapping.setdefault(empid, []).append(serialize_interest(rel.interest))
 
         return {'interests': mapping}
+
+    def get_employee_interests_columnar(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Compact employee_interests: each interest is listed once.
+
+        Response:
+          - catalog: interest_id -> interest (serialize_interest shape), for referenced interests
+          - employees: employee_id -> interest ids, in the same order as the nested format
+          - by_interest: interest_id -> employee ids (only with params['inverted_index'])
+
+        Built from the roster snapshot or, without it, from flat values_list queries;
+        no EmployeeInterest instances are created.
+        """
+        employee_ids = params.get('employee_ids')
+        catalog = {}
+        employees = {}
+        snapshot = roster_snapshot.get_snapshot()
+        if snapshot is not None:
+            for emp_id, interests in snapshot.interests(employee_ids).items():
+                for interest in interests:
+                    catalog.setdefault(interest['id'], interest)
+                employees[emp_id] = [interest['id'] for interest in interests]
+        else:
+            qs = self.EmployeeInterest.objects.order_by('id')
+            if employee_ids:
+                qs = qs.filter(employee_id__in=employee_ids)
+            for emp_id, interest_id in qs.values_list('employee_id', 'interest_id'):
+                employees.setdefault(str(emp_id), []).append(str(interest_id))
+            referenced = {int(i) for ids in employees.values() for i in ids}
+            for interest in self.Interest.objects.filter(id__in=referenced).only('id', 'name'):
+                catalog[str(interest.id)] = serialize_interest(interest)
+
+        out = {'format': 'columnar', 'catalog': catalog, 'employees': employees}
+        if params.get('inverted_index'):
+            by_interest = {}
+            for emp_id, ids in employees.items():
+                for interest_id in ids:
+                    by_interest.setdefault(interest_id, []).append(emp_id)
+            out['by_interest'] = by_interest
+        return out
+
+    def get_matching_bundle(self, params: Dict[str, Any], sections=BUNDLE_SECTIONS) -> Dict[str, Any]:
+        """Build the requested bundle sections.
+
+        Sections have the same shape as the standalone endpoints:
+          - employees: get_employees_for_matching(params)
+          - interests: employee_id -> interests for the employees in that roster
+          - previous_matches: first page of get_previous_matches(params)
+
+        Employees and interests always come from the same read: the roster snapshot
+        or, without it, a single prefetch. Sections may reflect different moments:
+        the snapshot can be up to DATA_API_ROSTER_SNAPSHOT_MAX_AGE seconds old, while
+        previous_matches is read from the database now. Only the database reads share
+        one transaction (REPEATABLE READ on PostgreSQL).
+        """
+        out = {}
+        fields = normalize_employee_fields(params.get('fields'))
+        snapshot = None
+        if 'employees' in sections or 'interests' in sections:
+            snapshot = roster_snapshot.get_snapshot()
+        if snapshot is not None:
+            employees = snapshot.employees(params.get('active_only', True), params.get('department_ids'))
+            if 'employees' in sections:
+                out['employees'] = {
+                    'employees': [project_employee(e, fields) for e in employees],
+                    'generated_at': datetime.utcnow().isoformat(),
+                }
+            if 'interests' in sections:
+                out['interests'] = {'interests': {e['id']: e['interests'] for e in employees if e['interests']}}
+        with transaction.atomic():
+            self._begin_read_snapshot()
+            if snapshot is None and ('employees' in sections or 'interests' in sections):
+                employees = list(self._employees_queryset(params, with_interests='interests' in sections))
+                if 'employees' in sections:
+                    out['employees'] = {
+                        'employees': [serialize_employee(e, fields) for e in employees],
+                        'generated_at': datetime.utcnow().isoformat(),
+                    }
+                if 'interests' in sections:
+                    mapping = {}
+                    for e in employees:
+                        for rel in e.interests.all():
+                            mapping.setdefault(str(e.id), []).append(serialize_interest(rel.interest))
+                    out['interests'] = {'interests': mapping}
+            if 'previous_matches' in sections:
+                out['previous_matches'] = self.get_previous_matches(params)
+        return out
+
+    @staticmethod
+    def _begin_read_snapshot():
+        conn = transaction.get_connection()
+        # only the outermost block may change isolation, and it must be the first statement
+        if conn.vendor == 'postgresql' and len(conn.atomic_blocks) == 1:
+            with conn.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+
+    def get_employees_delta(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Return roster changes since the watermark carried by params['cursor'].
+
+        Response:
+          - employees: active employees whose row changed (full serialized form)
+          - interests: employee_id -> full interests list, for active employees whose
+            interests changed but whose row did not
+          - deactivated: ids of employees that became inactive or were deleted
+          - cursor: watermark to pass on the next call
+          - full_resync: True when the cursor is missing/expired (or changes cannot be
+            tracked); 'employees' then holds the whole active roster and the client
+            must replace its copy.
+        """
+        now = timezone.now()
+        # step the watermark back a little so rows committed by transactions that
+        # started before `now` are not skipped; replays are harmless for the client
+        skew = timedelta(seconds=int(os.getenv('DATA_API_DELTA_SKEW_SECONDS', 5)))
+        next_cursor = encode_cursor({'v': 1, 'ts': (now - skew).isoformat()})
+
+        since = None
+        token = params.get('cursor')
+        if token:
+            data = decode_cursor(str(token))
+            try:
+                since = datetime.fromisoformat(data['ts'])
+            except (KeyError, TypeError, ValueError) as e:
+                raise InvalidCursor('cursor has no valid watermark') from e
+
+        delta = None
+        if since is not None and since > now - timedelta(seconds=cache_utils.tombstone_retention_seconds()):
+            delta = self._collect_delta(since)
+
+        if delta is None:
+            full = self.get_employees_for_matching({'active_only': True})
+            return {
+                'employees': full['employees'],
+                'interests': {},
+                'deactivated': [],
+                'cursor': next_cursor,
+                'full_resync': True,
+                'generated_at': full['generated_at'],
+            }
+
+        delta.update({'cursor': next_cursor, 'full_resync': False, 'generated_at': datetime.utcnow().isoformat()})
+        return delta
+
+    def _collect_delta(self, since: datetime) -> Optional[Dict[str, Any]]:
+        """Gather changes after `since`; None means a full resync is required."""
+        since_ts = since.timestamp()
+        for domain in ('interest_catalog', 'directory'):
+            if cache_utils.get_data_api_tombstones(domain, since_ts) != []:
+                # catalog or departments/business centers changed (or tombstones are
+                # unavailable) -> cannot express as a delta
+                return None
+        deleted_ids = cache_utils.get_data_api_tombstones('employees', since_ts)
+        unlinked_ids = cache_utils.get_data_api_tombstones('employee_interests', since_ts)
+        if deleted_ids is None or unlinked_ids is None:
+            return None
+
+        changed = list(self.Employee.objects.filter(updated_at__gt=since).values_list('id', 'is_active'))
+        active_changed = [emp_id for emp_id, is_active in changed if is_active]
+        deactivated = {str(emp_id) for emp_id, is_active in changed if not is_active}
+        deactivated.update(deleted_ids)
+
+        employees = []
+        if active_changed:
+            qs = self._employees_queryset({'active_only': True}).filter(id__in=active_changed)
+            employees = [serialize_employee(e) for e in qs]
+
+        interest_emp_ids = set(
+            self.EmployeeInterest.objects.filter(updated_at__gt=since).values_list('employee_id', flat=True)
+        )
+        interest_emp_ids.update(int(i) for i in unlinked_ids if i.isdigit())
+        interest_emp_ids.difference_update(active_changed)
+
+        interests = {}
+        if interest_emp_ids:
+            alive = list(self.Employee.objects.filter(id__in=interest_emp_ids, is_active=True).values_list('id', flat=True))
+            for emp_id in alive:
+                interests[str(emp_id)] = []
+            rels = self.EmployeeInterest.objects.select_related('interest').filter(employee_id__in=alive)
+            for rel in rels:
+                interests[str(rel.employee_id)].append(serialize_interest(rel.interest))
+
+        return {'employees': employees, 'interests': interests, 'deactivated': sorted(deactivated)}
@@ -0,0 +1,156 @@
+"""Per-worker, read-only snapshot of the roster used by the Data API.
+
+Employees, departments, business centers and interests are loaded with a few
+flat ``values_list`` queries and kept as tuples of pre-serialized rows, so a
+Data API miss filters in memory instead of running select_related/prefetch
+queries and re-serializing every employee.
+
+The snapshot is tagged with the Data API generation of the 'employees' and
+'interests' domains (see cache_utils) and rebuilt lazily, once per worker,
+on the first request after either generation moves. Writes that bypass model
+signals (QuerySet.update, raw SQL) do not move the generation, so a snapshot is
+also rebuilt once it is older than DATA_API_ROSTER_SNAPSHOT_MAX_AGE seconds.
+Rows and the dicts they hold are shared between requests and must not be
+mutated by callers.
+"""
+import os
+import logging
+import threading
+from time import monotonic
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from python_app.serializers.data_serializers import serialize_department, serialize_interest
+from python_app.services import cache_utils
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DOMAINS = ('employees', 'interests')
+
+_lock = threading.Lock()
+_current = None  # type: Optional[RosterSnapshot]
+
+
+class RosterSnapshot:
+    """Immutable roster view: one row per employee in the default (full_name) order.
+
+    rows[i] is (employee_id, department_id, is_active, serialized_employee), where
+    serialized_employee has the serialize_employee() shape.
+    """
+    __slots__ = ('generation', 'built_at', 'rows', '_position')
+
+    def __init__(self, generation: Tuple[int, ...], rows: Tuple[tuple, ...]):
+        self.generation = generation
+        self.built_at = monotonic()
+        self.rows = rows
+        self._position = {row[0]: pos for pos, row in enumerate(rows)}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def employees(self, active_only: bool = True, department_ids: Optional[Iterable] = None) -> List[Dict[str, Any]]:
+        """Serialized employees matching the employees_for_matching filters."""
+        depts = _int_set(department_ids) if department_ids else None
+        return [
+            emp for _id, dept_id, is_active, emp in self.rows
+            if (is_active or not active_only) and (depts is None or dept_id in depts)
+        ]
+
+    def interests(self, employee_ids: Optional[Iterable] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """employee_id -> interests for employees with at least one interest link."""
+        if employee_ids:
+            # roster order keeps the payload stable for a given id set
+            positions = sorted(self._position[i] for i in _int_set(employee_ids) if i in self._position)
+            rows = [self.rows[pos] for pos in positions]
+        else:
+            rows = self.rows
+        return {emp['id']: emp['interests'] for _id, _dept, _active, emp in rows if emp['interests']}
+
+
+def _int_set(values: Iterable) -> set:
+    """Normalize JSON ids (ints or numeric strings) like the ORM's __in lookup would."""
+    return {int(v) for v in values}
+
+
+def enabled() -> bool:
+    return os.getenv('DATA_API_ROSTER_SNAPSHOT', '1').lower() not in ('0', 'false', 'no')
+
+
+def _max_age() -> float:
+    return float(os.getenv('DATA_API_ROSTER_SNAPSHOT_MAX_AGE', 300))
+
+
+def _is_current(snapshot: Optional[RosterSnapshot], generation: Tuple[int, ...]) -> bool:
+    return (snapshot is not None and snapshot.generation == generation
+            and monotonic() - snapshot.built_at < _max_age())
+
+
+def build_snapshot(generation: Tuple[int, ...]) -> RosterSnapshot:
+    """Load the roster with flat queries and pre-serialize every employee once."""
+    from django.db import transaction
+    from employees.models import Employee, Department, BusinessCenter, Interest, EmployeeInterest
+    from python_app.services.data_api_service import DataAPIService
+
+    with transaction.atomic():
+        DataAPIService._begin_read_snapshot()
+        return _load(generation, Employee, Department, BusinessCenter, Interest, EmployeeInterest)
+
+
+def _load(generation, Employee, Department, BusinessCenter, Interest, EmployeeInterest) -> RosterSnapshot:
+    # serialize_department/serialize_interest only read attributes, so lightweight
+    # .only() instances give the same shape as the ORM path
+    departments = {d.id: serialize_department(d) for d in Department.objects.only('id', 'name', 'code')}
+    centers = {b.id: serialize_department(b) for b in BusinessCenter.objects.only('id', 'name')}
+    interests = {i.id: serialize_interest(i) for i in Interest.objects.only('id', 'name')}
+
+    links = {}
+    for emp_id, interest_id in EmployeeInterest.objects.order_by('id').values_list('employee_id', 'interest_id'):
+        links.setdefault(emp_id, []).append(interests[interest_id])
+
+    rows = []
+    fields = ('id', 'full_name', 'position', 'department_id', 'business_center_id', 'is_active')
+    for emp_id, full_name, position, dept_id, center_id, is_active in (
+        Employee.objects.order_by('full_name', 'id').values_list(*fields)
+    ):
+        serialized = {
+            'id': str(emp_id),
+            'full_name': full_name,
+            'department': departments.get(dept_id),
+            'position': position,
+            'business_center': centers.get(center_id),
+            'interests': links.get(emp_id, []),
+            'is_active': bool(is_active),
+        }
+        rows.append((emp_id, dept_id, bool(is_active), serialized))
+    return RosterSnapshot(generation, tuple(rows))
+
+
+def get_snapshot() -> Optional[RosterSnapshot]:
+    """Return a snapshot for the current generation, building it if needed.
+
+    Returns None when the snapshot is disabled or the generation cannot be read;
+    callers then query the database directly.
+    """
+    global _current
+    if not enabled():
+        return None
+    versions = cache_utils.get_data_api_versions(SNAPSHOT_DOMAINS)
+    if versions is None:
+        return None
+    generation = tuple(versions[d] for d in SNAPSHOT_DOMAINS)
+
+    snapshot = _current
+    if _is_current(snapshot, generation):
+        return snapshot
+    with _lock:
+        # another thread may have rebuilt it while we waited
+        snapshot = _current
+        if _is_current(snapshot, generation):
+            return snapshot
+        try:
+            snapshot = build_snapshot(generation)
+        except Exception:
+            logger.exception('roster snapshot build failed; falling back to queries')
+            return None
+        _current = snapshot
+        logger.info('roster snapshot rebuilt: %d employees, generation=%s', len(snapshot), generation)
+        return snapshot
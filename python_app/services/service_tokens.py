@@ -0,0 +1,143 @@
+"""Service tokens accepted by the Data API ``Authorization: Service <token>`` scheme.
+
+Tokens are resolved once and kept in memory; checking a request is a
+constant-time comparison against every accepted token, with no file I/O.
+
+Sources, first non-empty wins:
+  - SERVICE_AUTH_TOKEN environment variable
+  - the secret file SERVICE_AUTH_TOKEN_FILE (default /run/secrets/service_auth_token),
+    re-read when its mtime changes; the mtime is checked at most every
+    SERVICE_AUTH_TOKEN_RELOAD_SECONDS (default 5)
+  - settings.SERVICE_AUTH_TOKEN
+
+Any source may hold several tokens, one per line or comma-separated, so a new
+token can be rolled out before the old one is removed. A different provider can
+be plugged in with settings.DATA_API_TOKEN_PROVIDER (dotted path to a
+TokenProvider subclass).
+"""
+import os
+import logging
+import threading
+import secrets as _secrets
+from time import monotonic
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOKEN_FILE = '/run/secrets/service_auth_token'
+
+
+def parse_tokens(raw: Optional[str]) -> Tuple[bytes, ...]:
+    """Split a secret into its tokens, dropping BOMs, whitespace and empty entries."""
+    if not raw:
+        return ()
+    tokens = []
+    for line in raw.replace('\ufeff', '').replace(',', '\n').splitlines():
+        token = line.strip()
+        if token and token.encode('utf-8') not in tokens:
+            tokens.append(token.encode('utf-8'))
+    return tuple(tokens)
+
+
+class TokenProvider:
+    """Base class: subclasses return the currently accepted tokens from tokens()."""
+
+    def tokens(self) -> Tuple[bytes, ...]:
+        raise NotImplementedError
+
+    def is_valid(self, token: str) -> bool:
+        """Constant-time check of token against every accepted token."""
+        candidate = token.replace('\ufeff', '').strip().encode('utf-8')
+        accepted = self.tokens()
+        if not candidate or not accepted:
+            return False
+        # no early exit: the time taken does not reveal which token matched
+        matched = False
+        for expected in accepted:
+            matched |= _secrets.compare_digest(candidate, expected)
+        return matched
+
+
+class DefaultTokenProvider(TokenProvider):
+    """Environment, then the (reloaded) secret file, then settings; see module docstring."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._env_raw = None
+        self._env_tokens = ()
+        self._file_path = None
+        self._file_mtime = None
+        self._file_tokens = ()
+        self._next_stat = 0.0
+        self._settings_raw = None
+        self._settings_tokens = ()
+
+    def tokens(self) -> Tuple[bytes, ...]:
+        # environment lookups are in-memory; re-parse only when the value changes
+        # (tests/CI patch os.environ)
+        env_raw = os.getenv('SERVICE_AUTH_TOKEN', '')
+        if env_raw != self._env_raw:
+            self._env_raw, self._env_tokens = env_raw, parse_tokens(env_raw)
+        if self._env_tokens:
+            return self._env_tokens
+
+        file_tokens = self._tokens_from_file()
+        if file_tokens:
+            return file_tokens
+
+        settings_raw = getattr(settings, 'SERVICE_AUTH_TOKEN', None) or ''
+        if settings_raw != self._settings_raw:
+            self._settings_raw, self._settings_tokens = settings_raw, parse_tokens(settings_raw)
+        return self._settings_tokens
+
+    def _tokens_from_file(self) -> Tuple[bytes, ...]:
+        path = os.getenv('SERVICE_AUTH_TOKEN_FILE', DEFAULT_TOKEN_FILE)
+        now = monotonic()
+        if path == self._file_path and now < self._next_stat:
+            return self._file_tokens
+        with self._lock:
+            if path == self._file_path and now < self._next_stat:
+                return self._file_tokens
+            self._next_stat = now + float(os.getenv('SERVICE_AUTH_TOKEN_RELOAD_SECONDS', 5))
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                mtime = None
+            if path == self._file_path and mtime == self._file_mtime:
+                return self._file_tokens
+            tokens = ()
+            if mtime is not None:
+                try:
+                    with open(path, 'r', encoding='utf-8') as fh:
+                        tokens = parse_tokens(fh.read())
+                except Exception:
+                    logger.debug('Failed to read service token from file %s', path)
+            if self._file_path is not None and tokens != self._file_tokens:
+                logger.info('Service auth tokens reloaded from %s: %d accepted', path, len(tokens))
+            self._file_path, self._file_mtime, self._file_tokens = path, mtime, tokens
+            return tokens
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_token_provider() -> TokenProvider:
+    """Return the process-wide provider, creating it from settings on first use."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                path = getattr(settings, 'DATA_API_TOKEN_PROVIDER', None)
+                _provider = import_string(path)() if path else DefaultTokenProvider()
+    return _provider
+
+
+def reset_token_provider() -> None:
+    """Drop the cached provider (e.g. after changing DATA_API_TOKEN_PROVIDER in tests)."""
+    global _provider
+    with _provider_lock:
+        _provider = None
@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+"""Data API load benchmark on synthetic rosters (1k / 10k / 100k employees).
+
+For each roster size a throwaway test database is created and seeded with
+employees, interest links and secret-coffee history. Then employees-for-matching,
+employee-interests and previous-matches are driven in-process through the real
+URLs, auth and cache:
+
+- cold:       caches invalidated before every request (roster snapshot included)
+- warm:       repeated identical requests answered from the cache
+- concurrent: --concurrency simultaneous warm requests on one event loop, as an
+              ASGI worker would serve them
+
+For every endpoint and phase it records p50/p95/p99 latency, DB queries per
+request (cold/warm), response bytes and the worker RSS afterwards. Results are
+written as JSON (--output) so a run can be kept as a baseline; --compare prints
+the latency change against such a file.
+
+Uses the configured cache (Redis in docker). Pass --locmem to run without a
+Redis server.
+
+Run with: python tools/bench_data_api.py [--sizes 1000,10000,100000] [--repeat 30]
+          [--cold-repeat 5] [--concurrency 16] [--locmem] [--output bench.json]
+          [--compare baseline.json]
+"""
+import os
+import sys
+import json
+import random
+import asyncio
+import argparse
+import platform
+import subprocess
+from datetime import date, datetime, timedelta
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+import django
+django.setup()
+
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment
+
+BENCH_TOKEN = 'bench-token'
+os.environ['SERVICE_AUTH_TOKEN'] = BENCH_TOKEN
+
+# endpoint -> request body
+ENDPOINTS = {
+    'employees-for-matching': {},
+    'employee-interests': {},
+    'previous-matches': {'since_days': 3650},
+}
+URL_PREFIX = '/api/v1/data/'
+HEADERS = {'Authorization': f'Service {BENCH_TOKEN}'}
+
+
+def seed(n: int, history_weeks: int, rng: random.Random) -> dict:
+    """Bulk-insert n employees with interests and history_weeks of meetings; returns row counts."""
+    from employees.models import Department, BusinessCenter, Interest, Employee, EmployeeInterest
+    from activities.models import ActivitySession, SecretCoffeeMeeting
+
+    batch = 5000
+    Department.objects.bulk_create(
+        [Department(name=f'Department {i}', code=f'D{i}') for i in range(max(5, n // 250))], batch_size=batch)
+    BusinessCenter.objects.bulk_create([BusinessCenter(name=f'BC {i}') for i in range(5)], batch_size=batch)
+    Interest.objects.bulk_create(
+        [Interest(code=f'bench{i}', name=f'Interest {i}', emoji='*') for i in range(12)], batch_size=batch)
+    dept_ids = list(Department.objects.values_list('id', flat=True))
+    center_ids = list(BusinessCenter.objects.values_list('id', flat=True))
+    interest_ids = list(Interest.objects.values_list('id', flat=True))
+
+    positions = ('Senior Engineer', 'Engineer', 'Junior Analyst', 'Team Lead', 'Manager')
+    Employee.objects.bulk_create(
+        [Employee(full_name=f'Employee {i:06d}', position=positions[i % len(positions)],
+                  department_id=rng.choice(dept_ids), business_center_id=rng.choice(center_ids),
+                  is_active=rng.random() < 0.95)
+         for i in range(n)],
+        batch_size=batch,
+    )
+    emp_ids = list(Employee.objects.order_by('id').values_list('id', flat=True))
+
+    links = []
+    for emp_id in emp_ids:
+        for interest_id in rng.sample(interest_ids, rng.randint(1, 4)):
+            links.append(EmployeeInterest(employee_id=emp_id, interest_id=interest_id))
+    EmployeeInterest.objects.bulk_create(links, batch_size=batch)
+
+    monday = date.today() - timedelta(days=date.today().weekday())
+    ActivitySession.objects.bulk_create(
+        [ActivitySession(activity_type='secret_coffee', week_start=monday - timedelta(weeks=w))
+         for w in range(history_weeks)])
+    meetings = 0
+    for session_id in ActivitySession.objects.values_list('id', flat=True):
+        shuffled = emp_ids[:]
+        rng.shuffle(shuffled)
+        rows = [
+            SecretCoffeeMeeting(meeting_id=f'B{session_id}-{k}', activity_session_id=session_id,
+                                employee1_id=shuffled[k], employee2_id=shuffled[k + 1], meeting_format='ONLINE',
+                                employee1_code='A', employee2_code='B')
+            for k in range(0, len(shuffled) - 1, 2)
+        ]
+        SecretCoffeeMeeting.objects.bulk_create(rows, batch_size=batch)
+        meetings += len(rows)
+    return {'employees': len(emp_ids), 'interest_links': len(links), 'meetings': meetings}
+
+
+def rss_bytes():
+    """Current resident set size of this process, or the peak if /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except Exception:
+        return None
+
+
+def _percentiles(samples_ms) -> dict:
+    samples = sorted(samples_ms)
+
+    def pick(q):
+        return round(samples[min(len(samples) - 1, int(len(samples) * q))], 3)
+
+    return {'n': len(samples), 'p50_ms': pick(0.50), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99),
+            'max_ms': round(samples[-1], 3)}
+
+
+def _post(client: Client, endpoint: str):
+    return client.post(URL_PREFIX + endpoint, data=json.dumps(ENDPOINTS[endpoint]),
+                       content_type='application/json', headers=HEADERS)
+
+
+def run_sequential(endpoint: str, repeat: int, cold: bool) -> dict:
+    from python_app.services.cache_utils import invalidate_all_data_api
+
+    client = Client()
+    if not cold:
+        _post(client, endpoint)  # fill the cache
+    samples, queries, body_bytes = [], [], None
+    for _ in range(repeat):
+        if cold:
+            # new generation: cache entries and the roster snapshot are rebuilt
+            invalidate_all_data_api()
+        with CaptureQueriesContext(connection) as captured:
+            start = perf_counter()
+            response = _post(client, endpoint)
+            samples.append((perf_counter() - start) * 1000.0)
+        if response.status_code != 200:
+            raise RuntimeError(f'{endpoint} returned {response.status_code}: {response.content[:200]!r}')
+        queries.append(len(captured))
+        body_bytes = len(response.content)
+    result = _percentiles(samples)
+    result.update({'queries_per_request': round(sum(queries) / len(queries), 2), 'body_bytes': body_bytes,
+                   'rss_bytes': rss_bytes()})
+    return result
+
+
+async def _concurrent(endpoint: str, concurrency: int, repeat: int) -> dict:
+    client = AsyncClient()
+    samples = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for _ in range(repeat):
+            start = perf_counter()
+            response = await client.post(URL_PREFIX + endpoint, data=json.dumps(ENDPOINTS[endpoint]),
+                                         content_type='application/json', headers=HEADERS)
+            samples.append((perf_counter() - start) * 1000.0)
+            if response.status_code != 200:
+                errors += 1
+
+    start = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = perf_counter() - start
+    result = _percentiles(samples)
+    result.update({'concurrency': concurrency, 'errors': errors,
+                   'throughput_rps': round(len(samples) / wall, 1) if wall else None, 'rss_bytes': rss_bytes()})
+    return result
+
+
+def bench_size(n: int, args) -> dict:
+    start = perf_counter()
+    counts = seed(n, args.history_weeks, random.Random(args.seed))
+    out = {'seed': counts, 'seed_seconds': round(perf_counter() - start, 2), 'endpoints': {}}
+    for endpoint in ENDPOINTS:
+        phases = {
+            'cold': run_sequential(endpoint, args.cold_repeat, cold=True),
+            'warm': run_sequential(endpoint, args.repeat, cold=False),
+        }
+        if args.concurrency > 0:
+            phases['concurrent'] = asyncio.run(_concurrent(endpoint, args.concurrency, max(1, args.repeat // 2)))
+        out['endpoints'][endpoint] = phases
+        print(f"  {endpoint:<24} cold p50 {phases['cold']['p50_ms']:>9.2f}ms "
+              f"q={phases['cold']['queries_per_request']:<5} warm p50 {phases['warm']['p50_ms']:>8.2f}ms "
+              f"p99 {phases['warm']['p99_ms']:>8.2f}ms bytes={phases['warm']['body_bytes']}", flush=True)
+    return out
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except Exception:
+        return None
+
+
+def compare(current: dict, baseline: dict) -> None:
+    """Print p50/p95 latency of current vs baseline for every size/endpoint/phase both contain."""
+    print(f"\n{'size':>7} {'endpoint':<24} {'phase':<10} {'p50 base':>10} {'p50 now':>10} {'p95 base':>10} "
+          f"{'p95 now':>10} {'change':>8}")
+    for size, result in current['results'].items():
+        base_size = baseline.get('results', {}).get(size)
+        if not base_size:
+            continue
+        for endpoint, phases in result['endpoints'].items():
+            for phase, now in phases.items():
+                base = base_size['endpoints'].get(endpoint, {}).get(phase)
+                if not base:
+                    continue
+                change = (now['p50_ms'] - base['p50_ms']) / base['p50_ms'] * 100 if base['p50_ms'] else 0.0
+                print(f"{size:>7} {endpoint:<24} {phase:<10} {base['p50_ms']:>8.2f}ms {now['p50_ms']:>8.2f}ms "
+                      f"{base['p95_ms']:>8.2f}ms {now['p95_ms']:>8.2f}ms {change:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--repeat', type=int, default=30, help='warm requests per endpoint')
+    parser.add_argument('--cold-repeat', type=int, default=5, help='cold requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=16, help='simultaneous requests (0 to skip)')
+    parser.add_argument('--history-weeks', type=int, default=8, help='weeks of secret-coffee history to seed')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--locmem', action='store_true', help='use LocMemCache instead of the configured cache')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--compare', help='baseline JSON from an earlier --output run')
+    args = parser.parse_args()
+    sizes = [int(x) for x in args.sizes.split(',') if x]
+
+    overrides = {'ALLOWED_HOSTS': ['testserver', 'localhost', '127.0.0.1']}
+    if args.locmem:
+        overrides['CACHES'] = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+    report = {
+        'meta': {
+            'git_commit': _git_commit(),
+            'timestamp': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'platform': platform.platform(),
+            'db_vendor': connection.vendor,
+            'cache': 'locmem' if args.locmem else 'configured',
+            'repeat': args.repeat,
+            'cold_repeat': args.cold_repeat,
+            'concurrency': args.concurrency,
+            'history_weeks': args.history_weeks,
+        },
+        'results': {},
+    }
+
+    setup_test_environment()
+    with override_settings(**overrides):
+        for n in sizes:
+            print(f'{n} employees', flush=True)
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                report['results'][str(n)] = bench_size(n, args)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2)
+        print(f'results written to {args.output}')
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as fh:
+            compare(report, json.load(fh))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""Benchmark the Data API cache-hit path at 1k / 10k / 50k employees.
+
+Compares two ways of serving a cached employees_for_matching payload:
+
+- legacy: the payload dict is stored in the Django cache (django-redis pickles
+  and zlib-compresses it) and re-encoded by JsonResponse on every hit;
+- bytes:  the final encoded body (and gzip copy) is stored as a raw Redis hash
+  and written straight to the response (python_app.api.data_api).
+
+Uses the configured cache (Redis in docker). Pass --locmem to run without a
+Redis server; LocMemCache pickles values too, so the comparison still holds,
+minus the network and zlib cost.
+
+Run with: python tools/bench_data_api_cache_hits.py [--sizes 1000,10000,50000] [--repeat 50] [--locmem]
+"""
+import os
+import sys
+import argparse
+import statistics
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+import django
+django.setup()
+
+from django.http import JsonResponse
+from django.test.utils import override_settings
+
+
+def synthetic_payload(n: int) -> dict:
+    """Employees payload shaped like serialize_employee() output."""
+    departments = [{'id': str(i), 'name': f'Department {i}', 'code': f'D{i}'} for i in range(40)]
+    centers = [{'id': str(i), 'name': f'BC {i}', 'code': None} for i in range(5)]
+    interests = [{'id': str(i), 'name': f'Interest {i}', 'category': None} for i in range(12)]
+    employees = []
+    for i in range(n):
+        employees.append({
+            'id': str(i + 1),
+            'full_name': f'Employee Number {i + 1}',
+            'department': departments[i % len(departments)],
+            'position': ('Senior Engineer', 'Engineer', 'Junior Analyst', 'Team Lead')[i % 4],
+            'business_center': centers[i % len(centers)],
+            'interests': [interests[(i + k) % len(interests)] for k in range(i % 4 + 1)],
+            'is_active': True,
+        })
+    return {'employees': employees, 'generated_at': '2025-01-01T00:00:00'}
+
+
+def _timed(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        start = perf_counter()
+        fn()
+        samples.append((perf_counter() - start) * 1000.0)
+    samples.sort()
+    return {
+        'p50_ms': statistics.median(samples),
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+    }
+
+
+def bench_size(n: int, repeat: int) -> dict:
+    from django.core.cache import cache
+    from python_app.api import data_api
+    from python_app.services.cache_utils import get_data_api_entry, set_data_api_entry
+
+    payload = synthetic_payload(n)
+    legacy_key = f'data_api:bench_legacy:{n}'
+    bytes_key = f'data_api:bench_bytes:{n}'
+
+    cache.set(legacy_key, payload, 600)
+    variants = data_api._encoded_variants(data_api._encode_body(payload))
+    set_data_api_entry(bytes_key, variants, 600)
+
+    def legacy_hit():
+        return JsonResponse(cache.get(legacy_key), safe=False).content
+
+    def bytes_hit():
+        return data_api._bytes_response(get_data_api_entry(bytes_key, ['body']), [], None).content
+
+    def bytes_hit_gzip():
+        return data_api._bytes_response(get_data_api_entry(bytes_key, ['gzip', 'body']), ['gzip'], None).content
+
+    try:
+        return {
+            'employees': n,
+            'body_bytes': len(variants['body']),
+            'gzip_bytes': len(variants.get('gzip') or b''),
+            'legacy': _timed(legacy_hit, repeat),
+            'bytes': _timed(bytes_hit, repeat),
+            'bytes_gzip': _timed(bytes_hit_gzip, repeat),
+        }
+    finally:
+        cache.delete(legacy_key)
+        cache.delete(bytes_key)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,50000')
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--locmem', action='store_true', help='use LocMemCache instead of the configured cache')
+    args = parser.parse_args()
+    sizes = [int(x) for x in args.sizes.split(',') if x]
+
+    def run():
+        print(f"{'employees':>10} {'body KB':>9} {'gzip KB':>9} {'legacy p50':>11} {'bytes p50':>10} "
+              f"{'gzip p50':>9} {'legacy p95':>11} {'bytes p95':>10} {'speedup':>8}")
+        for n in sizes:
+            r = bench_size(n, args.repeat)
+            speedup = r['legacy']['p50_ms'] / r['bytes']['p50_ms'] if r['bytes']['p50_ms'] else float('inf')
+            print(f"{n:>10} {r['body_bytes'] / 1024:>9.0f} {r['gzip_bytes'] / 1024:>9.0f} "
+                  f"{r['legacy']['p50_ms']:>9.2f}ms {r['bytes']['p50_ms']:>8.2f}ms {r['bytes_gzip']['p50_ms']:>7.2f}ms "
+                  f"{r['legacy']['p95_ms']:>9.2f}ms {r['bytes']['p95_ms']:>8.2f}ms {speedup:>7.1f}x")
+
+    if args.locmem:
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            run()
+    else:
+        run()
+
+
+if __name__ == '__main__':
+    main()